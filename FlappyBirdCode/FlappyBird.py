@@ -3,32 +3,83 @@ import random # random module. Used for randomizing generation of pipes
 import os # module used for setting up path 
 import time # python module for importing time access
 from pygame.locals import * # pygame imports
-
-#initializations
-pygame.font.init() # init font
-pygame.mixer.init()  # pygame sound mixer init
-
-GAME_SOUNDS = {} # game sounds dictionary
+from physics import lookup # precomputed bird physics
+from collision import get_mask # cached collision masks
+from pipe_ring import PipeRing # pipes on screen, in arrays
+from sprites import SpriteAtlas # bird sprites rotated once at load time
+from renderer import DirtyRectRenderer # redraws and updates only what moved
+from labels import LabelCache # text labels rendered once per value
+from latency import tracer, Replay, REPLAY # input-to-photon latency, on with FLAPPY_LATENCY=1 or FLAPPY_REPLAY=script.json
+from profiler import profiler # per-phase timing of the game loop, on with FLAPPY_PROFILE=1
+from assets import get_assets # images, loaded on first use
+from audio import SoundPool # sounds decoded once, on channels of their own
+
+GAME_SOUNDS = SoundPool() # game sounds, loaded by setup(); silent with FLAPPY_MUTE=1 and when replaying
 
 #Game window specifications
 WIN_WIDTH = 600 # game window width
 WIN_HEIGHT = 800 # game window height
 PIPE_VEL = 3 # velocity at which pipes move on the screen
 FLOOR = 700 # size of floor
+TICK_RATE = 30 # physics ticks per second, whatever the frame rate
+TICK = 1000 / TICK_RATE # milliseconds of game time simulated by a tick
+FPS = 60 # frames drawn per second at most
+MAX_LAG = 5 * TICK # game time caught up after a stall at most, so a long stall doesn't take long ticks to recover from
+
+# Importing this module has no side effects: the window, fonts and images are
+# only set up by setup(), which has to run before main().
+WIN = None # game window
+STAT_FONT = None # font for score
+END_FONT = None # font to restart game
+SCORE_LABELS = None # score label, rendered again only when the score changes
+bg_img = None # background image
+bird_images = None # three frames of the flapping bird
+bird_atlas = None # every bird image at every tilt, rotated around its center
+renderer = None # restores the background only where sprites were drawn
+replay = None # scripted space presses, None when a person is playing
+
+
+def setup():
+    """
+    opens the game window and loads fonts, sounds and images, only the first time it is called
+    :return: pygame window surface
+    """
+    global WIN, STAT_FONT, END_FONT, SCORE_LABELS, bg_img, bird_images, bird_atlas, renderer
+    if WIN is not None:
+        return WIN
+
+    if REPLAY: # scripted games run without a window or sound
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    #initializations
+    pygame.font.init() # init font
+    GAME_SOUNDS.load(enabled=not REPLAY and os.environ.get("FLAPPY_MUTE") != "1")
+
+    #fonts in pygame
+    STAT_FONT = pygame.font.SysFont("comicsans", 50)
+    END_FONT = pygame.font.SysFont("comicsans", 70)
+    SCORE_LABELS = LabelCache(STAT_FONT, (0,0,255))
+
+    #Display options of game window, before loading images so they can be converted to its format
+    WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT)) #display pygame window wrt to given width and height
+    pygame.display.set_caption("Flappy Bird") # Game window caption
+
+    #Loading images
+    assets = get_assets()
+    bg_img = assets.background
+    bird_images = assets.birds
+    bird_atlas = SpriteAtlas(bird_images)
+    renderer = DirtyRectRenderer(bg_img)
+
+    # sprites shared by every bird, pipe and base
+    Bird.IMGS = bird_images
+    Pipe.PIPE_TOP = assets.pipe_top
+    Pipe.PIPE_BOTTOM = assets.pipe
+    Base.IMG = assets.base
+    Base.WIDTH = assets.base.get_width()
+    return WIN
 
-#fonts in pygame
-STAT_FONT = pygame.font.SysFont("comicsans", 50) # font for score
-END_FONT = pygame.font.SysFont("comicsans", 70) # font to restart game
-
-#Display options of game window
-WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT)) #display pygame window wrt to given width and height
-pygame.display.set_caption("Flappy Bird") # Game window caption
-
-#Loading images
-pipe_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","pipe.png")).convert_alpha())
-bg_img = pygame.transform.scale(pygame.image.load(os.path.join("imgs","bg.png")).convert_alpha(), (600, 900))
-bird_images = [pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","bird" + str(x) + ".png"))) for x in range(1,4)]
-base_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","base.png")).convert_alpha())
 
 class Bird:
     """
@@ -38,10 +89,13 @@ class Bird:
     #WIN_HEIGHT = 0 
     #WIN_WIDTH = 0
     MAX_ROTATION = 25 # max rotation of bird
-    IMGS = bird_images # images
+    IMGS = None # images, set by setup()
     ROT_VEL = 20 # speed at which bird rotates
     ANIMATION_TIME = 5 # animation of birds flapping
 
+    # no per instance __dict__, the images and constants above are shared by the class
+    __slots__ = ("x", "y", "prev_y", "gravity", "tilt", "tick_count", "vel", "height", "img_count", "img")
+
     # init method or constructor
     def __init__(self, x, y):
         """
@@ -54,6 +108,7 @@ class Bird:
         #Here self represents the Bird class i.e., self.x is same as Bird.x = x
         self.x = x # starting x pos of bird
         self.y = y # starting y pos of bird
+        self.prev_y = y # y pos before the last tick, drawing happens somewhere in between
         self.gravity = 9.8 # gravity constant
         self.tilt = 0  # degrees to tilt
         self.tick_count = 0 # bird jump and fall 
@@ -71,7 +126,7 @@ class Bird:
         self.vel = -10.5 # velocity of bird jump
         self.tick_count = 0 # keeps track of last jump for keeping track of jump and fall of bird
         self.height = self.y # original height and starting point of bird
-        GAME_SOUNDS['wing'].play() # game sound of wings flapping
+        GAME_SOUNDS.play('wing') # game sound of wings flapping
 
     def move(self):
         """
@@ -79,33 +134,23 @@ class Bird:
         :return: None
         """
         self.tick_count += 1 # keeping tack of how much bird moved with regard to last jump or starting
+        self.prev_y = self.y
 
-        # for downward acceleration
-        displacement = self.vel*(self.tick_count) + 0.5*(3)*(self.tick_count)**2  # calculating displacement i.e., movement of bird up and down 
-
-        # terminal velocity i.e., velocity of bird capped to a value so that bird doesnot move very fast in either direction 
-        if displacement >= 16:
-            displacement = (displacement/abs(displacement)) * 16
-            
-            
-        # jump value or jump height
-        if displacement < 0:
-            displacement -= 2
+        # displacement (with terminal velocity and jump height) and tilt only depend on
+        # how long ago the bird jumped, so they are looked up instead of worked out
+        tilt = self.tilt
+        displacement, self.tilt = lookup(self.vel, self.tick_count)
 
         self.y = self.y + displacement # moving bird slowly up or down. Change y position based on displacement
 
-        if displacement < 0 or self.y < self.height + 50:  # d < 0 or self.y is bird moving up. Tilting up of bird
-            if self.tilt < self.MAX_ROTATION: # for tilt angle of 25
-                self.tilt = self.MAX_ROTATION # if yes then tilt bird by 25 directly
-        else:  # tilting down of bird
-            if self.tilt > -90: # rotate bird directly by 90 degrees.
-                self.tilt -= self.ROT_VEL #looks like bird is nose diving
-                GAME_SOUNDS['swoosh'].play() # game sound of bird falling down
+        if self.tilt < tilt: # tilting down of bird, looks like bird is nose diving
+            GAME_SOUNDS.play('swoosh') # game sound of bird falling down
 
-    def draw(self, win):
+    def animate(self):
         """
-        draw the bird
-        :param win: pygame window or surface
+        advance the wing flapping animation by one tick.
+        Done every physics tick rather than every drawn frame, because the
+        current image is also used for collision.
         :return: None
         """
         self.img_count += 1
@@ -128,100 +173,39 @@ class Bird:
             self.img = self.IMGS[0] # display image 1 when nose diving
             self.img_count = self.ANIMATION_TIME*2 # when we jump back up after diving, motion is in a continous form
 
+    def draw(self, win, alpha=1):
+        """
+        draw the bird
+        :param win: pygame window or surface
+        :param alpha: how far into the next tick the frame is drawn, 0 shows the previous position and 1 the current one
+        :return: pygame Rect drawn
+        """
+        y = self.prev_y + (self.y - self.prev_y) * alpha # in between the last two ticks
 
         # tilt the bird based on its center. 
-        blitRotateCenter(win, self.img, (self.x, self.y), self.tilt) #rotate bird image wrt its center
+        return blitRotateCenter(win, self.img, (self.x, y), self.tilt) #rotate bird image wrt its center
 
     def get_mask(self):
         """
         gets the mask for the current image of the bird
         :return: None
         """
-        return pygame.mask.from_surface(self.img)
+        return get_mask(self.img) # cached, the bird only ever shows one of its three images
 
 
 # Class for all pipe related objects
 class Pipe():
     """
-    represents a pipe object
+    what every pipe shares: the pipes on screen are kept in a PipeRing
     """
 
     WIN_HEIGHT = WIN_HEIGHT # game window width
     WIN_WIDTH = WIN_WIDTH # game window height
     GAP = 200 # gap in between 2 pipes
     VEL = 5 # velocity of pipe moving on screen
+    PIPE_TOP = None # top pipe image, flipped once and shared by every pipe, set by setup()
+    PIPE_BOTTOM = None # bottom pipe image
 
-    def __init__(self, x):
-        """
-        initialize pipe object
-        :param x: int
-        :param y: int
-        :return" None
-        """
-        self.x = x # starting location of pipe in x
-        self.height = 0 # height of pipe at start 
-        self.gap = 100  # gap between top and bottom pipe
-
-        # where the top and bottom of the pipe is
-        self.top = 0 # Location of top pipe at start 
-        self.bottom = 0 # location of bottom pipe at start 
-
-        self.PIPE_TOP = pygame.transform.flip(pipe_img, False, True) # rotating of pipe image for top pipe
-        self.PIPE_BOTTOM = pipe_img # pipe image
-
-        self.passed = False # check if bird has already passed a pipe
-
-        self.set_height() # Defining where top, bottom pipes are, where gap is and height of top, bottom pipe
-
-    def set_height(self):
-        """
-        set the height of the pipe, from the top of the screen
-        :return: None
-        """
-        self.height = random.randrange(50, 450) # randomizing height of pipe
-        self.top = self.height - self.PIPE_TOP.get_height() # Figuring out top left of pipe to draw it on screen, as top pipe will extend down on to the screen. location of top of a pipe
-        self.bottom = self.height + self.GAP #Top left of pipe to draw on screen. location of bottom pipe
-
-    def move(self):
-        """
-        move pipe based on vel
-        :return: None
-        """
-        self.x -= self.VEL # velocity of pipe moving wrt FPS/clock of game
-
-    def draw(self, win):
-        """
-        draw both the top and bottom of the pipe
-        :param win: pygame window/surface
-        :return: None
-        """
-        
-        win.blit(self.PIPE_TOP, (self.x, self.top)) # draw top pipe
-        win.blit(self.PIPE_BOTTOM, (self.x, self.bottom)) # draw bottom pipe
-
-
-    def collide(self, bird, win):
-        """
-        returns if a point is colliding with the pipe
-        :param bird: Bird object
-        :return: Bool
-        """
-        bird_mask = bird.get_mask() # getting masked bird
-        top_mask = pygame.mask.from_surface(self.PIPE_TOP) # masking top pipe
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM) # masking bottom pipe
-        
-        # Offset checks how far away masks are from each other 
-        top_offset = (self.x - bird.x, self.top - round(bird.y)) # offset from bird_mask to top_mask
-        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y)) # offset from bird_mask to bottom_mask
-
-        b_point = bird_mask.overlap(bottom_mask, bottom_offset) # checking for pixel collision of bird_mask and bottom pipe (offset of bottom pipe)
-        t_point = bird_mask.overlap(top_mask,top_offset) # checking for pixel collision of bird_mask and top pipe (offset of top pipe)
-
-        if b_point or t_point: # checking for collision and overlapping of pixels
-            return True # checks if bird is colliding with pipe object 
-        
-
-        return False
 
 class Base:
     """
@@ -229,8 +213,10 @@ class Base:
     """
     VEL = 5 # velocity of base moving
     #WIN_WIDTH = WIN_WIDTH # width of base
-    WIDTH = base_img.get_width() # base image
-    IMG = base_img # base image
+    WIDTH = None # width of the base image, set by setup()
+    IMG = None # base image
+
+    __slots__ = ("y", "x1", "x2")
 
     def __init__(self, y):
         """
@@ -256,14 +242,14 @@ class Base:
         if self.x2 + self.WIDTH < 0: # checking if x2 is off the screen completely
             self.x2 = self.x1 + self.WIDTH # cycling back x2 image behind x1 image for movement
 
-    def draw(self, win):
+    def draw(self, win, shift=0):
         """
         Draw the floor. This is two images that move together.
         :param win: the pygame surface/window
-        :return: None
+        :param shift: pixels to the right of the current position, to draw in between two ticks
+        :return: pygame Rects drawn
         """
-        win.blit(self.IMG, (self.x1, self.y))
-        win.blit(self.IMG, (self.x2, self.y))
+        return win.blit(self.IMG, (self.x1 + shift, self.y)), win.blit(self.IMG, (self.x2 + shift, self.y))
 
 
 #pipe rotation for top pipe
@@ -274,29 +260,29 @@ def blitRotateCenter(surf, image, topleft, angle):
     :param image: the image surface to rotate
     :param topLeft: the top left position of the image
     :param angle: a float value for angle
-    :return: None
+    :return: pygame Rect drawn
     """
-    rotated_image = pygame.transform.rotate(image, angle)
-    new_rect = rotated_image.get_rect(center = image.get_rect(topleft = topleft).center)
+    return bird_atlas.blit(surf, image, topleft, angle) # pre-rotated, images or angles not in the atlas are rotated once and kept
 
-    surf.blit(rotated_image, new_rect.topleft)
 
-
-def end_screen(win):
+def end_screen(win, pilot=None):
     """
     display an end screen when the player loses
     :param win: the pygame window surface
+    :param pilot: passed on to main when a new game starts
     :return: None
     """
     run = True
     text_label = END_FONT.render("Press SPACE TO START", 0.5 , (255,0,0))
     while run:
+        if replay is not None:
+            replay.post()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
 
             if event.type == pygame.KEYDOWN:
-                main(win)
+                main(win, pilot)
 
         #win.blit(text_label, (WIN_WIDTH/2 - text_label.get_width()/2, 500))
         text_rect = text_label.get_rect(center=(WIN_WIDTH/2, WIN_HEIGHT/2))
@@ -308,60 +294,114 @@ def end_screen(win):
     quit()
 
 
-def draw_window(win, bird, pipes, base, score):
+def draw_window(win, bird, pipes, base, score, alpha=1, scrolling=True):
     """
-    draws the windows for the main game loop
+    draws the windows for the main game loop. Only the areas where
+    something was drawn last frame or this frame are redrawn and updated.
     :param win: pygame window surface
     :param bird: a Bird object
-    :param pipes: List of pipes
+    :param pipes: PipeRing
     :param score: score of the game (int)
+    :param alpha: how far into the next tick the frame is drawn (0 to 1), positions are interpolated between the last two ticks
+    :param scrolling: pipes and base moved on the last tick
     :return: None
     """
-    win.blit(bg_img, (0,0)) # drawing background image on game window
+    renderer.begin(win) # background back over last frame's sprites
 
-    # drawing pipes on screen
-    for pipe in pipes:
-        pipe.draw(win)
+    # drawing pipes on screen, they moved VEL to the left on the last tick
+    renderer.add(*pipes.draw(win, (1 - alpha) * Pipe.VEL if scrolling else 0))
 
     # drawing base on screen
-    base.draw(win)
-    bird.draw(win)
+    renderer.add(*base.draw(win, (1 - alpha) * Base.VEL if scrolling else 0))
+    renderer.add(bird.draw(win, alpha))
 
     # score
-    score_label = STAT_FONT.render("Score: " + str(score),1,(0,0,255))
+    score_label = SCORE_LABELS.render("Score: " + str(score))
     
-    win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
+    renderer.blit(win, score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
+    profiler.count("blits", len(renderer.dirty) + 2*len(pipes) + 2 + 1 + 1) # background patches, pipes, base, bird, score
+    profiler.lap("render")
 
-    pygame.display.update()
+    renderer.end() # only the old and new sprite areas reach the display
+    profiler.lap("flip")
 
 
-def main(win):
+def update(win, bird, pipes, base, score, lost):
+    """
+    advances the game by one physics tick
+    :param win: pygame window surface
+    :param bird: a Bird object
+    :param pipes: PipeRing
+    :param base: Base object
+    :param score: score of the game (int)
+    :param lost: the bird hit a pipe, the pipes and base have stopped
+    :return: (score, lost, bird hit the ground or left the screen)
+    """
+    # Move Bird, base and pipes
+    bird.move()
+    if not lost:
+        base.move()
+        profiler.lap("physics")
+
+        pipes.move(Pipe.VEL) # moving pipes on game window
+        for slot in pipes: # to check for more than 1 pipe
+            if pipes.collide(slot, bird): # check for collision
+                GAME_SOUNDS.play('hit')
+                #GAME_SOUNDS.play('die')
+                lost = True
+        profiler.lap("collision")
+
+        # Keeping track of new pipes and score variable
+        if pipes.pass_birds(bird.x): #if pipe is passed by bird we add a new pipe
+            GAME_SOUNDS.play('point')
+            score += 1 #adding score when bird passes through a pipe
+            pipes.spawn(WIN_WIDTH) #adding new pipe at the end of game window
+
+        pipes.cull() # removing pipes that went off the screen
+        profiler.lap("spawn/cull")
+    else:
+        profiler.lap("physics")
+
+    if bird.y + bird_images[0].get_height() - 10 >= FLOOR or bird.y < -50: # Checking if bird hits the ground and check if bird above the screen
+        #GAME_SOUNDS.play('hit')
+        GAME_SOUNDS.play('die')
+        return score, lost, True
+    profiler.lap("collision")
+
+    bird.animate() # wing flapping, the image shown is used for collision on the next tick
+    return score, lost, False
+
+
+def main(win, pilot=None):
     """
     Runs the main game loop
     :param win: pygame window surface
+    :param pilot: callable(bird, pipes) asked before every tick whether the bird
+                  should jump, None to only jump on space presses
     :return: None
     """
 
-    # Game sounds
-    GAME_SOUNDS['die'] = pygame.mixer.Sound('gallery/audio/die.wav')
-    GAME_SOUNDS['hit'] = pygame.mixer.Sound('gallery/audio/hit.wav')
-    GAME_SOUNDS['point'] = pygame.mixer.Sound('gallery/audio/point.wav')
-    GAME_SOUNDS['swoosh'] = pygame.mixer.Sound('gallery/audio/swoosh.wav')
-    GAME_SOUNDS['wing'] = pygame.mixer.Sound('gallery/audio/wing.wav')
-
+    renderer.reset() # the end screen drew over the last game, start with a full frame
     bird = Bird(230,50) #Starting position of bird
     base = Base(FLOOR) # base on floor
-    pipes = [Pipe(700)] # Pipes list. There can be more than 1 pipe on screen at time so list is being used to keep track of all pipes
+    pipes = PipeRing(Pipe.PIPE_TOP, Pipe.PIPE_BOTTOM, Pipe.GAP) # every pipe on screen, there can be more than 1 at a time
+    pipes.spawn(700)
     score = 0 # starting score
 
     clock = pygame.time.Clock() # setting frame rate / FPS
     lost = False 
+    dead = False
+    lag = 0 # game time not simulated yet, milliseconds
 
+    # Fixed timestep: the game always advances in ticks of TICK ms, as many as
+    # the time since the last frame calls for, and frames are drawn in between.
     run = True
     while run:
-        pygame.time.delay(30)
-        clock.tick(60)
+        lag += min(clock.tick(FPS), MAX_LAG) # only frame limiting, jumps are not held back by a fixed delay
+        profiler.begin() # waiting for the next frame is not part of any phase
 
+        if replay is not None:
+            replay.post()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
@@ -370,51 +410,33 @@ def main(win):
             if event.type == pygame.KEYDOWN and not lost:
                 if event.key == pygame.K_SPACE:
                     bird.jump()
-                    GAME_SOUNDS['wing'].play()
-
-        # Move Bird, base and pipes
-        bird.move()
-        if not lost:
-            base.move()
-
-            rem = [] # list of removed pipes
-            add_pipe = False
-            for pipe in pipes: # to check for more than 1 pipe
-                pipe.move() # moving pipes on game window
-        
-                if pipe.collide(bird, win): # check for collision
-                    GAME_SOUNDS['hit'].play()
-                    #GAME_SOUNDS['die'].play()
-                    lost = True
-                
-
-
-                if pipe.x + pipe.PIPE_TOP.get_width() < 0: #remove pipe when it passes a certain location on screen
-                    rem.append(pipe) # removing pipe
-
-                # Checking if pipe is passed and addition of new pipe
-                if not pipe.passed and pipe.x < bird.x: #check if bird has passes the pipe
-                    pipe.passed = True #check if bird is passed a pipe
-                    add_pipe = True #if pipe is passed by bird we add a new pipe
-            
-            # Keeping track of new pipes and score variable
-            if add_pipe:
-                GAME_SOUNDS['point'].play()
-                score += 1 #adding score when bird passes through a pipe
-                pipes.append(Pipe(WIN_WIDTH)) #adding new pipe at the end of game window
-                
-
-            for r in rem: #remove pipe when a bird passes through it
-                pipes.remove(r) # removing pipes that have been passed
-
-
-        if bird.y + bird_images[0].get_height() - 10 >= FLOOR or bird.y < -50: # Checking if bird hits the ground and check if bird above the screen
-            #GAME_SOUNDS['hit'].play()
-            GAME_SOUNDS['die'].play()
+                    GAME_SOUNDS.play('wing')
+                    tracer.input(getattr(event, "stamp", None)) # replayed presses carry the time they were scripted for
+        profiler.lap("event")
+
+        while lag >= TICK:
+            lag -= TICK
+            if pilot is not None and not lost and pilot(bird, pipes):
+                bird.jump()
+                GAME_SOUNDS.play('wing')
+            score, lost, dead = update(win, bird, pipes, base, score, lost)
+            if dead:
+                break
+            tracer.tick() # jumps pressed so far have taken effect
+        if dead:
             break
 
-        draw_window(WIN, bird, pipes, base, score)
+        draw_window(WIN, bird, pipes, base, score, lag / TICK, not lost)
+        tracer.frame() # on screen now
+        profiler.end_frame()
+
+    profiler.report("Frame profile") # where this game spent its time
+    tracer.report("Input latency")
+    end_screen(WIN, pilot)
 
-    end_screen(WIN)
 
-main(WIN)
\ No newline at end of file
+if __name__ == "__main__":
+    if REPLAY:
+        replay = Replay(REPLAY)
+        random.seed(replay.seed) # the same pipes every replay
+    main(setup())
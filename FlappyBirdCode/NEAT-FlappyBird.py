@@ -1,35 +1,54 @@
 import pygame #python game module
-import random #used for randomizing the pipes
 import os #used for setting up path for pickle file 
 import time #python module for time
+import argparse #command line options
+import multiprocessing #parallel evaluation of genomes
+import functools #binding evaluation options for neat
 import neat #NEAT algorithm module 
 import pickle #module to include pickle file
-
-
-pygame.font.init()  # init font
+import numpy as np #arrays for network inputs
+from population import BirdPopulation, PipeCollisionTable #vectorized birds
+from batch_network import BatchNetwork #all networks of a generation evaluated at once
+from course import make_courses #seeded pipe courses
+from pipe_ring import PipeRing #pipes on screen, in arrays
+from physics import lookup #precomputed bird physics
+from collision import get_mask #cached collision masks
+from sprites import SpriteAtlas #bird sprites rotated once at load time
+from labels import LabelCache #text labels rendered once per value
+from fitness_cache import FitnessCache, FitnessCacheReporter, network_key #skip replaying unchanged networks
+from profiler import profiler #per-phase timing of the game loop
+from assets import get_assets #images, loaded on first use
+from checkpoint import BackgroundWriter, CheckpointReporter, CheckpointStore, save_network, write_file #checkpoints and saved networks, written in the background
+
+
+# Headless training: no window, no fonts, no frame limiting. Selected with the
+# --headless flag or FLAPPY_HEADLESS=1 in the environment, and implied by --workers.
+HEADLESS = os.environ.get("FLAPPY_HEADLESS") == "1"
 
 #Window specifications
 WIN_WIDTH = 600 #window screen width size
 WIN_HEIGHT = 800 #window screen height size
 FLOOR = 700 # size of floor
-
-#fonts in pygame
-STAT_FONT = pygame.font.SysFont("comicsans", 50) #font style
-END_FONT = pygame.font.SysFont("comicsans", 70) #font style
+MAX_SCORE = 21 # a game stops once the score gets past this
 
 DRAW_LINES = True #draw lines from each bird to top and bottom of the pipe
-
-#Display options of window
-WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT)) #display pygame window wrt to given width and height
-pygame.display.set_caption("Flappy Bird") #Window caption
-
-#Loading images 
-pipe_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","pipe.png")).convert_alpha()) #pipe img
-bg_img = pygame.transform.scale(pygame.image.load(os.path.join("imgs","bg.png")).convert_alpha(), (600, 900)) #background img
-bird_images = [pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","bird" + str(x) + ".png"))) for x in range(1,4)] #bird images
-base_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","base.png")).convert_alpha()) #base img
+DENSITY_BIN = 10 #height in pixels of a band of the bird density strip
+DENSITY_WIDTH = 120 #length in pixels of the longest bar of the density strip
+
+# Importing this module has no side effects: the window, fonts, images and
+# collision tables are only set up by setup(), which has to run before play().
+WIN = None #game window, stays None when headless
+STAT_FONT = None #nothing is drawn when headless
+END_FONT = None
+STAT_LABELS = None #score, gens and alive labels
+bg_img = None #background img
+bird_images = None #bird images
+bird_atlas = None #every bird image at every tilt, rotated around its center
+TOP_PIPE_TABLE = None #pixel perfect collision of each bird image against the pipes, used by BirdPopulation
+BOTTOM_PIPE_TABLE = None
 
 gen = 0 #generation of birds = 0
+writer = BackgroundWriter() #best networks and checkpoints are written on its thread while training goes on
 
 
 class Bird:
@@ -38,10 +57,13 @@ class Bird:
     """
 
     MAX_ROTATION = 25 #max rotation of bird when going up or down {25 degrees}
-    IMGS = bird_images #images used 
+    IMGS = None #images used, set by setup()
     ROT_VEL = 20 #speed at which rotation of bird takes place
     ANIMATION_TIME = 5 # How long our bird will flap its wings. Animation of birds wings flapping
 
+    # no per instance __dict__, the images and constants above are shared by the class
+    __slots__ = ("x", "y", "tilt", "tick_count", "vel", "height", "img_count", "img")
+
     def __init__(self, x, y):
         """
         Initializing the object
@@ -74,34 +96,19 @@ class Bird:
         making the bird move
         :return: None
         """
-
         self.tick_count += 1 #keeping tack of how much bird moved with regard to last jump or starting
 
-        # for downward acceleration
-        displacement = self.vel*(self.tick_count) + 0.5*(3)*(self.tick_count)**2  # calculating displacement i.e., movement of bird up and down
-
-        # terminal velocity i.e., velocity of bird capped to a value so that bird doesnot move very fast in either direction 
-        if displacement >= 16:
-            displacement = (displacement/abs(displacement)) * 16
-        
-        #jump value or jump height
-        if displacement < 0: 
-            displacement -= 2
+        # displacement (with terminal velocity and jump height) and tilt only depend on
+        # how long ago the bird jumped, so they are looked up instead of worked out
+        displacement, self.tilt = lookup(self.vel, self.tick_count)
 
         self.y = self.y + displacement # Change y position based on displacement. moving bird slowly up or down
 
-        # tiltiing of bird is based on displacement. 
-        if displacement < 0 or self.y < self.height + 50:  # d < 0 or self.y is bird moving up. Tilting up the bird
-            if self.tilt < self.MAX_ROTATION: # for tilt angle of 25 
-                self.tilt = self.MAX_ROTATION # if yes then tilt bird by 25 directly
-        else:  # tilting down of bird
-            if self.tilt > -90: # rotate bird directly by 90 degrees.
-                self.tilt -= self.ROT_VEL #looks like bird is nose diving
-
-    def draw(self, win):
+    def animate(self):
         """
-        drawing the bird
-        :param win: pygame window or surface
+        advance the wing flapping animation by one frame.
+        Kept apart from drawing because the current image is also used for
+        collision, so headless runs must animate exactly like windowed runs.
         :return: None
         """
         self.img_count += 1 # How many times game loop is running.
@@ -124,6 +131,13 @@ class Bird:
             self.img = self.IMGS[0] # display image 1 when nose diving
             self.img_count = self.ANIMATION_TIME*2 # when we jump back up after diving, motion is in a continous form
 
+    def draw(self, win):
+        """
+        drawing the bird
+        :param win: pygame window or surface
+        :return: None
+        """
+        self.animate()
 
         # tilt the bird
         blitRotateCenter(win, self.img, (self.x, self.y), self.tilt) #rotate bird image wrt its center 
@@ -135,95 +149,29 @@ class Bird:
         gets the mask for the current image of the bird
         :return: None
         """
-        return pygame.mask.from_surface(self.img) # masking all the bird images.
+        return get_mask(self.img) # cached, the bird only ever shows one of its three images
 
 
 # Class for all pipe related objects
 class Pipe():
     """
-    represents a pipe object
+    what every pipe shares: the pipes on screen are kept in a PipeRing
     """
     GAP = 200 # Space in between pipe
     VEL = 5 # How fast our pipes are moving on screen
-
-    def __init__(self, x):
-        """
-        initializing pipe object
-        :param x: int
-        :param y: int
-        :return" None
-        """
-        self.x = x #location of pipe in x
-        self.height = 0 #height of pipe at start
-
-        #where the top and bottom of the pipe at initialization
-        self.top = 0 # Location of top pipe at start 
-        self.bottom = 0 # Location of bottom pipe at start 
-
-        self.PIPE_TOP = pygame.transform.flip(pipe_img, False, True) #rotating of pipe image for top pipe
-        self.PIPE_BOTTOM = pipe_img # pipe image
-
-        self.passed = False #check if bird has already passed a pipe
-
-        self.set_height() # Defining where top, bottom pipes are, where gap is and height of top, bottom pipe
-
-    def set_height(self):
-        """
-        set the height of the pipe, from the top of the screen
-        :return: None
-        """
-        self.height = random.randrange(50, 450) #randomizing top of pipe
-        self.top = self.height - self.PIPE_TOP.get_height() # Figuring out top left of pipe to draw it on screen, as top pipe will extend down on to the screen. location of top of a pipe
-        self.bottom = self.height + self.GAP #Top left of pipe to draw on screen. location of bottom pipe
-
-    def move(self): # To move pipe we have to change x position based on veloity of the game
-        """
-        moving pipe based on vel
-        :return: None
-        """
-        self.x -= self.VEL #velocity of pipe moving wrt to FPS of game (move pipe to left of screen)
-
-    def draw(self, win):
-        """
-        drawing top and bottom of the pipe
-        :param win: pygame window/surface
-        :return: None
-        """
-        win.blit(self.PIPE_TOP, (self.x, self.top)) #draw top pipe
-        win.blit(self.PIPE_BOTTOM, (self.x, self.bottom)) #draw bottom pipe
+    PIPE_TOP = None # top pipe image, flipped once and shared by every pipe, set by setup()
+    PIPE_BOTTOM = None # bottom pipe image
 
 
-    def collide(self, bird, win):
-        """
-        returns if a point is colliding with the pipe
-        :param bird: Bird object
-        :return: Bool
-        """
-        # Masking images
-        bird_mask = bird.get_mask() # Getting masked bird ( bird class declaration)
-        top_mask = pygame.mask.from_surface(self.PIPE_TOP) #masking top pipe
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM) #masking bottom pipe
-        
-        # Offset checks how far away masks are from each other 
-        top_offset = (self.x - bird.x, self.top - round(bird.y)) #offset from bird_mask to top_mask
-        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y)) #offset from bird_mask to bottom_mask
-
-        b_point = bird_mask.overlap(bottom_mask, bottom_offset) #checking for pixel collision of bird_mask and bottom pipe(offset of bottom pipe)
-        t_point = bird_mask.overlap(top_mask,top_offset) #checking for picel collision of bird_mask and top pipe(offset of top pipe)
-
-        if b_point or t_point: #checking for collision and overlapping of pixels
-            return True # checks if bird is colliding with pipe object 
-            
-
-        return False
-
 class Base:
     """
     Represnting the moving floor of the game
     """
     VEL = 5 #velocity of base moving 
-    WIDTH = base_img.get_width() #width of base
-    IMG = base_img #base img
+    WIDTH = None #width of base, set by setup()
+    IMG = None #base img
+
+    __slots__ = ("y", "x1", "x2")
 
     def __init__(self, y):
         """
@@ -259,6 +207,50 @@ class Base:
         win.blit(self.IMG, (self.x2, self.y)) # drawing base image on game window
 
 
+def setup(headless=None):
+    """
+    loads the images and builds the collision tables, and unless headless opens
+    the window and loads the fonts; only the first time it is called
+    :param headless: no window or fonts, None to go by HEADLESS
+    :return: pygame window surface, None when headless
+    """
+    global WIN, STAT_FONT, END_FONT, STAT_LABELS, bg_img, bird_images, bird_atlas, TOP_PIPE_TABLE, BOTTOM_PIPE_TABLE
+    if bird_images is not None:
+        return WIN
+    if headless is None:
+        headless = HEADLESS
+
+    if not headless:
+        pygame.font.init()  # init font
+
+        #fonts in pygame
+        STAT_FONT = pygame.font.SysFont("comicsans", 50) #font style
+        END_FONT = pygame.font.SysFont("comicsans", 70) #font style
+        STAT_LABELS = LabelCache(STAT_FONT, (255,255,255))
+
+        #Display options of window, before loading images so they can be converted to its format
+        WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT)) #display pygame window wrt to given width and height
+        pygame.display.set_caption("Flappy Bird") #Window caption
+
+    #Loading images
+    assets = get_assets(headless)
+    if not headless:
+        bg_img = assets.background # never drawn when headless
+    bird_images = assets.birds
+    bird_atlas = SpriteAtlas(bird_images)
+
+    # sprites shared by every bird, pipe and base
+    Bird.IMGS = bird_images
+    Pipe.PIPE_TOP = assets.pipe_top
+    Pipe.PIPE_BOTTOM = assets.pipe
+    Base.IMG = assets.base
+    Base.WIDTH = assets.base.get_width()
+
+    TOP_PIPE_TABLE = PipeCollisionTable([get_mask(img) for img in bird_images], get_mask(Pipe.PIPE_TOP))
+    BOTTOM_PIPE_TABLE = PipeCollisionTable([get_mask(img) for img in bird_images], get_mask(Pipe.PIPE_BOTTOM))
+    return WIN
+
+
 def blitRotateCenter(surf, image, topleft, angle):
     """
     Rotate a surface and blit it to the window
@@ -268,20 +260,36 @@ def blitRotateCenter(surf, image, topleft, angle):
     :param angle: a float value for angle
     :return: None
     """
-    rotated_image = pygame.transform.rotate(image, angle)
-    new_rect = rotated_image.get_rect(center = image.get_rect(topleft = topleft).center)
+    bird_atlas.blit(surf, image, topleft, angle) # pre-rotated, images or angles not in the atlas are rotated once and kept
+
+def draw_density(win, birds):
+    """
+    draws how many birds are alive at each height, as bars from the left edge of the window,
+    so a whole population can be followed while only a few birds are drawn
+    :param win: pygame window surface
+    :param birds: BirdPopulation of the current generation
+    :return: None
+    """
+    counts = birds.y_histogram(DENSITY_BIN, FLOOR)
+    longest = counts.max() if len(counts) else 0
+    if longest == 0:
+        return
+    for band in np.flatnonzero(counts):
+        width = max(1, int(DENSITY_WIDTH * counts[band] / longest))
+        pygame.draw.rect(win, (255,255,0), (0, band * DENSITY_BIN, width, DENSITY_BIN - 1))
 
-    surf.blit(rotated_image, new_rect.topleft)
 
-def draw_window(win, birds, pipes, base, score, gen, pipe_ind):
+def draw_window(win, birds, pipes, base, score, gen, pipe_ind, shown=None, density=False):
     """
     draws the windows for the main game loop
     :param win: pygame window surface
-    :param bird: a Bird object
-    :param pipes: List of pipes
+    :param birds: BirdPopulation of the current generation
+    :param pipes: PipeRing
     :param score: score of the game (int)
     :param gen: current generation
-    :param pipe_ind: index of closest pipe
+    :param pipe_ind: slot of the pipe ahead of the birds
+    :param shown: indices of the birds to draw, None for every bird alive
+    :param density: draw the density strip of every bird alive
     :return: None
     """
     if gen == 0:
@@ -289,177 +297,588 @@ def draw_window(win, birds, pipes, base, score, gen, pipe_ind):
     win.blit(bg_img, (0,0)) # drawing background image on screen
 
     # Drawing pipes on screen
-    for pipe in pipes: 
-        pipe.draw(win) 
+    pipes.draw(win)
 
     # Drawing base on screen
     base.draw(win)
 
-    for bird in birds:
+    if density:
+        draw_density(win, birds)
+
+    for i in birds.alive_index() if shown is None else shown:
+        img = bird_images[birds.frame[i]] # image the bird is showing this frame
+        y = birds.y[i]
         # draw lines from bird to pipe
         if DRAW_LINES:
             try:
-                pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_TOP.get_width()/2, pipes[pipe_ind].height), 5)
-                pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_BOTTOM.get_width()/2, pipes[pipe_ind].bottom), 5)
+                pygame.draw.line(win, (255,0,0), (birds.x+img.get_width()/2, y + img.get_height()/2), (pipes.x[pipe_ind] + pipes.width/2, pipes.height[pipe_ind]), 5)
+                pygame.draw.line(win, (255,0,0), (birds.x+img.get_width()/2, y + img.get_height()/2), (pipes.x[pipe_ind] + pipes.width/2, pipes.bottom[pipe_ind]), 5)
             except:
                 pass
         # draw bird
-        bird.draw(win)
+        blitRotateCenter(win, img, (birds.x, y), birds.tilt[i])
 
     # score
-    score_label = STAT_FONT.render("Score: " + str(score),1,(255,255,255))
+    score_label = STAT_LABELS.render("Score: " + str(score))
     win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
 
     # generations
-    score_label = STAT_FONT.render("Gens: " + str(gen-1),1,(255,255,255))
+    score_label = STAT_LABELS.render("Gens: " + str(gen-1))
     win.blit(score_label, (10, 10))
 
     # alive
-    score_label = STAT_FONT.render("Alive: " + str(len(birds)),1,(255,255,255))
+    score_label = STAT_LABELS.render("Alive: " + str(len(birds)))
     win.blit(score_label, (10, 50))
 
+    profiler.count("blits", 1 + 2*len(pipes) + 2 + (len(birds) if shown is None else len(shown)) + 3) # background, pipes, base, birds, labels
+    profiler.lap("render")
+
     pygame.display.update()
+    profiler.lap("flip")
 
 
-def eval_genomes(genomes, config):
+def play(nets, course, win=None, geometric=False, decision_interval=1, render_interval=1, render_top=0, density=False,
+         budget=None):
+    """
+    plays one game with a bird for each network, until every bird
+    is dead or the score gets past MAX_SCORE.
+    Every bird is stepped at once through a BirdPopulation; bird i plays with nets[i].
+
+    Physics, collision and fitness run every frame whatever the intervals are:
+    a bird gets 0.1 for every frame it stays alive, 5 for every pipe passed while
+    alive and -1 for hitting a pipe. With a decision interval of N the networks
+    are only asked on frames 1, N+1, 2N+1... and a bird can only jump on those
+    frames, so the same network can score differently at another interval, but a
+    fitness always means the same frames survived and pipes passed. The render
+    interval, render_top and density only change what is drawn, never the fitness.
+    :param nets: list of neat.nn.FeedForwardNetwork
+    :param course: Course giving the pipe heights
+    :param win: pygame window to draw on, None to run headless
+    :param geometric: bird/pipe collision by rectangles instead of pixel perfect
+    :param decision_interval: frames between two network decisions (int, 1 for every frame)
+    :param render_interval: frames between two drawn frames (int, 1 for every frame); the
+                            frame rate limit only applies to drawn frames
+    :param render_top: only draw this many of the fittest birds (int, 0 for every bird);
+                       drawing then costs about the same whatever the population size
+    :param density: also draw a strip of how many birds are alive at each height
+    :param budget: int array, frames each bird may play before it is taken out of the game
+                   (without the penalty for hitting a pipe), None for no limit
+    :return: fitness of each bird (list), final score, index of the first bird still alive
+             when the score got past MAX_SCORE (None otherwise), number of frames played,
+             frames each bird stayed in the game (int array)
+    """
+    batch = BatchNetwork(nets) # nets compiled into arrays, evaluated together every frame
+    birds = BirdPopulation(len(nets), 230, 350, [img.get_height() for img in bird_images]) # Starting pos of every bird
+
+    base = Base(FLOOR) # base and its width
+    pipes = PipeRing(Pipe.PIPE_TOP, Pipe.PIPE_BOTTOM, Pipe.GAP) # every pipe on screen, there can be more than 1 at a time
+    pipes.spawn(700, course.height(0))
+    score = 0 # starting score
+    spawned = 1 # pipes taken from the course so far
+
+    clock = pygame.time.Clock() # Setting frame rate/ FPS 
+    frames = 0 # frames simulated this generation
+    leader = None # bird whose network is saved once the score is high enough
+    lived = np.zeros(len(nets), dtype=np.int64) # frames each bird stayed in the game
+
+    run = True
+    while run and len(birds) > 0:
+        frames += 1
+        render = win is not None and frames % render_interval == 0 # frames in between are only simulated
+        if render: # headless runs as fast as the CPU allows
+            clock.tick(30) # setting FPS at 30 
+        profiler.begin() # waiting for the next frame is not part of any phase
+
+        if render:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    run = False 
+                    pygame.quit()
+                    quit()
+                    break
+            profiler.lap("event")
+
+        # the pipe on the screen the birds look at for neural network input: once they are
+        # past a pipe (all birds share one x pos) they look at the next one
+        pipe_ind = pipes.ahead_slot(birds.x)
+
+        alive = birds.alive_index()
+        birds.fitness[alive] += 0.1 # give each bird a fitness of 0.1 for each frame it stays alive
+        lived[alive] += 1
+        birds.move() #moving every bird
+        base.move() # moving base on game window
+        profiler.lap("physics")
+
+        if (frames - 1) % decision_interval == 0: # the networks only decide every decision_interval frames
+            # send bird location, top pipe location and bottom pipe location and determine from network whether to jump or not
+            y = birds.y[alive]
+            output = batch.activate(np.column_stack((y, np.abs(y - pipes.height[pipe_ind]), np.abs(y - pipes.bottom[pipe_ind]))), alive)
+            # y is first info we need, abs(y - top pipe height), abs(y - bottom pipe top) = finding bistance b/w top pipe, bottom pipe and bird
+
+            birds.jump(alive[output[:, 0] > 0.5])  # we use a tanh activation function so result will be between -1 and 1. if over 0.5 jump
+            profiler.count("activations", len(alive))
+            profiler.lap("inference")
+
+        pipes.move(Pipe.VEL) # moving pipes on game window
+
+        # check for collision of all birds with every pipe
+        hit = birds.hit_pipes(pipes, TOP_PIPE_TABLE, BOTTOM_PIPE_TABLE, geometric)
+        birds.fitness[hit] -= 1 # every time a bird hits pipe -1 fitness is removed from that bird
+        birds.kill(hit) # remove birds that have collided
+        profiler.lap("collision")
+
+        # Keeping track of new pipes and score variable
+        if pipes.pass_birds(birds.x): #if pipe is passed by birds we add a new pipe
+            score += 1 #adding score when bird passes through a pipe
+            birds.fitness[birds.alive] += 5 #increase fitness when bird passes through a pipe
+            pipes.spawn(WIN_WIDTH, course.height(spawned)) #adding new pipe at the end of game window
+            spawned += 1
+
+        pipes.cull() #remove pipes that went off the screen
+        profiler.lap("spawn/cull")
+
+        # Checking if birds hit the ground or went above the screen
+        birds.kill(birds.out_of_bounds(FLOOR))
+        if budget is not None:
+            birds.kill(lived >= budget) # out of frames
+        profiler.lap("collision")
+
+        birds.animate() # advance wing flapping, the shown image is used for collision
+        profiler.lap("physics")
+        if render:
+            shown = birds.leaders(render_top) if render_top else None
+            draw_window(win, birds, pipes, base, score, gen, pipe_ind, shown, density)
+        profiler.end_frame()
+
+        # break generation score gets large enough, the first bird alive is the best one
+        if score > MAX_SCORE and len(birds) > 0:
+            leader = int(birds.alive_index()[0])
+            break
+
+    return birds.fitness.tolist(), score, leader, frames, lived
+
+
+def species_of(genomes, population):
+    """
+    species of each genome, for play_courses
+    :param genomes: list of (genome_id, genome)
+    :param population: the neat.Population being run, None to put every genome in one species
+    :return: list of species keys (int), -1 for a genome without a species
+    """
+    if population is None:
+        return [0] * len(genomes)
+    # read every generation, neat replaces the species set when every species died out
+    return [population.species.genome_to_species.get(genome_id, -1) for genome_id, _ in genomes]
+
+
+def play_courses(nets, courses, win=None, geometric=False, decision_interval=1, render_interval=1, render_top=0,
+                 density=False, elitism=0, species=None, frame_cap=0):
+    """
+    plays every network on each of the courses, in one game per course.
+
+    With elitism, networks that are not going to be among the elitism fittest of
+    their species stop early (neat keeps that many elites of each species). After
+    each course the best and the worst game played so far stand in for what a
+    course not played yet can give: a network ends up at most its total so far
+    plus the best game for each course left, and at least its total plus the
+    worst game. A network whose best case is below the worst case of the
+    elitism-th network of its species plays no more courses. This is a
+    heuristic: a network that would beat every game so far on a later course can
+    be stopped. An elite has to lead by about the difference between the best
+    and the worst game for each course left, so most stops come on the last
+    courses, and with few courses there is little to save.
+
+    A network that did not play every course (stopped, or out of frame_cap) is
+    given its worst case, the worst game so far for each course it missed,
+    rather than its mean over fewer courses than the others.
+    :param nets: list of neat.nn.FeedForwardNetwork
+    :param courses: list of Course
+    :param win: pygame window to draw on, None to run headless
+    :param geometric: bird/pipe collision by rectangles instead of pixel perfect
+    :param decision_interval: frames between two network decisions, see play
+    :param render_interval: frames between two drawn frames, see play
+    :param render_top: only draw this many of the fittest birds, 0 for every bird
+    :param density: also draw a strip of how many birds are alive at each height
+    :param elitism: elites neat keeps of each species, 0 to play every course
+    :param species: species key of each network (list of int), None for one species
+    :param frame_cap: most frames a network plays over all the courses together, 0 for no cap;
+                      a network that runs out is taken out of the game
+    :return: fitness of each network (list), index of the best network that played every course if a game got past
+             MAX_SCORE (None otherwise), frames played over all the games, whether each network played every course (list)
+    """
+    total = np.zeros(len(nets)) # fitness summed over the courses played
+    played = np.zeros(len(nets), dtype=np.int64) # courses played
+    used = np.zeros(len(nets), dtype=np.int64) # frames played
+    species = np.zeros(len(nets), dtype=np.int64) if species is None else np.asarray(species, dtype=np.int64)
+    active = np.arange(len(nets)) # networks still playing
+    best_game, worst_game = -np.inf, np.inf # fitness of the best and worst game played so far
+    frames = 0
+    finished = False # some game got past MAX_SCORE
+
+    for k, course in enumerate(courses):
+        if frame_cap:
+            active = active[used[active] < frame_cap]
+        if len(active) == 0:
+            break
+        budget = frame_cap - used[active] if frame_cap else None
+        fitness, _, leader, course_frames, lived = play([nets[i] for i in active], course, win, geometric, decision_interval,
+                                                        render_interval, render_top, density, budget)
+        fitness = np.asarray(fitness)
+        total[active] += fitness
+        played[active] += 1
+        used[active] += lived
+        best_game = max(best_game, fitness.max())
+        worst_game = min(worst_game, fitness.min())
+        frames += course_frames
+        finished = finished or leader is not None
+
+        left = len(courses) - k - 1
+        if elitism and left:
+            lowest = total[active] + left * worst_game # every course left as bad as the worst game so far
+            highest = total[active] + left * best_game # or as good as the best one
+            keep = np.ones(len(active), dtype=bool)
+            for key in np.unique(species[active]):
+                members = np.flatnonzero(species[active] == key)
+                if len(members) > elitism:
+                    threshold = np.partition(lowest[members], -elitism)[-elitism] # the species' elites end up at least here
+                    keep[members] = highest[members] >= threshold
+            profiler.count("early stops", len(active) - int(np.count_nonzero(keep)))
+            active = active[keep]
+
+    complete = played == len(courses)
+    missed = len(courses) - played
+    fitness = (total + missed * (worst_game if np.isfinite(worst_game) else 0)) / max(len(courses), 1)
+    leader = None
+    if finished and complete.any():
+        leader = int(np.flatnonzero(complete)[np.argmax(fitness[complete])]) # fittest over every course, lowest index on ties
+    return fitness.tolist(), leader, frames, complete.tolist()
+
+
+def save_best(net):
+    """
+    saves the network of the best bird to best.pickle and, in the binary network
+    format of the checkpoint module, to best.net. Both are written in the background.
+    :param net: neat.nn.FeedForwardNetwork
+    :return: None
+    """
+    write_file("best.pickle", pickle.dumps(net), writer)
+    save_network("best.net", net, writer)
+
+
+def lookup_fitness(ge, nets, courses, cache):
+    """
+    sets the fitness of genomes whose network already played these courses
+    :param ge: list of genomes
+    :param nets: their networks
+    :param courses: list of Course the generation plays
+    :param cache: FitnessCache, None to play every genome
+    :return: indices of the genomes that still have to be played, cache key of every genome
+    """
+    if cache is None:
+        return list(range(len(ge))), None
+
+    keys = [network_key(net, courses) for net in nets]
+    todo = []
+    for i, genome in enumerate(ge):
+        fitness = cache.get(keys[i])
+        if fitness is None:
+            todo.append(i)
+        else:
+            genome.fitness = fitness # same network on the same courses, same fitness
+    return todo, keys
+
+
+def eval_genomes(genomes, config, courses=1, seed=None, cache=None, geometric=False,
+                 decision_interval=1, render_interval=1, render_top=0, density=False, early_stop=True, frame_cap=0,
+                 population=None):
     """
     runs the simulation of the current population of
     birds and sets their fitness based on the distance they
     reach in the game.
+    :param genomes: list of (genome_id, genome)
+    :param config: neat config
+    :param courses: number of pipe courses to play, fitness is the average over them
+    :param seed: int to play the same courses every generation, None for new ones
+    :param cache: FitnessCache of networks already played, None to play every genome
+    :param geometric: bird/pipe collision by rectangles instead of pixel perfect
+    :param decision_interval: frames between two network decisions, see play
+    :param render_interval: frames between two drawn frames, see play
+    :param render_top: only draw this many of the fittest birds, 0 for every bird
+    :param density: also draw a strip of how many birds are alive at each height
+    :param early_stop: stop playing genomes that are not going to be among the elites of their species, see play_courses
+    :param frame_cap: most frames a genome plays over all the courses, 0 for no cap
+    :param population: the neat.Population being run, for the genomes' species (None for one species)
+    :return: None
     """
     global WIN, gen
-    win = WIN
     gen += 1
 
-    # start by creating lists holding the genome itself, the
-    # neural network associated with the genome and the
-    # bird object that uses that network to play
+    # start by creating lists holding the genome itself and the
+    # neural network associated with the genome
     nets = [] 
-    birds = [] 
     ge = [] 
     for genome_id, genome in genomes:
         genome.fitness = 0  # start with fitness level of 0
         net = neat.nn.FeedForwardNetwork.create(genome, config) # Neural network creation
         nets.append(net) # appending NN to nets list
-        birds.append(Bird(230,350)) # Starting pos of bird and append it to birds list
         ge.append(genome) # appending genomes to ge list
 
-    base = Base(FLOOR) # base and its width
-    pipes = [Pipe(700)] # Pipes list. There can be more than 1 pipe on screen at time so list is being used to keep track of all pipes
-    score = 0 # starting score
+    start = time.perf_counter()
+    courses = make_courses(courses, seed)
+    todo, keys = lookup_fitness(ge, nets, courses, cache)
+    if not todo:
+        return
 
-    clock = pygame.time.Clock() # Setting frame rate/ FPS 
+    elitism = config.reproduction_config.elitism if early_stop else 0
+    species = species_of([genomes[i] for i in todo], population)
+    fitness, leader, frames, complete = play_courses([nets[i] for i in todo], courses, WIN, geometric, decision_interval,
+                                                     render_interval, render_top, density, elitism, species, frame_cap)
+    for i, value, played_all in zip(todo, fitness, complete):
+        ge[i].fitness = value # average over the courses
+        if cache is not None and played_all: # the worst case of a stopped genome depends on the rest of the generation
+            cache.put(keys[i], value)
 
-    run = True
-    while run and len(birds) > 0:
-        clock.tick(30) # setting FPS at 30 
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False 
-                pygame.quit()
-                quit()
-                break
-
-        # determine whether to use the first or second pipe on the screen for neural network input
-        pipe_ind = 0 # setting index of pipe that is visible to bird as 0
-        if len(birds) > 0:
-            if len(pipes) > 1 and birds[0].x > pipes[0].x + pipes[0].PIPE_TOP.get_width(): # Checking if bird has passed that pipe 
-                #if len(pipes) > 1 we get x position of any bird as x pos is always same, if it is > pipes[0].x we ask bird to look at second pipe at list
-                pipe_ind = 1 # Increasing index if bird has passed the pipe                                                                
-
-        for x, bird in enumerate(birds):  
-            ge[x].fitness += 0.1 # give each bird a fitness of 0.1 for each frame it stays alive
-            bird.move() #moving the bird game window
+    # put best bird in pickle file
+    if leader is not None:
+        save_best(nets[todo[leader]])
 
-            # send bird location, top pipe location and bottom pipe location and determine from network whether to jump or not
-            output = nets[birds.index(bird)].activate((bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom)))
-            # bird.y is first info we need, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom) = finding bistance b/w top pipe, bottom pipe and bird
+    if HEADLESS:
+        elapsed = time.perf_counter() - start
+        print("Simulated {} frames in {:.2f}s ({:.0f} frames/sec)".format(frames, elapsed, frames / max(elapsed, 1e-9)))
 
-            if output[0] > 0.5:  # we use a tanh activation function so result will be between -1 and 1. if over 0.5 jump
-                bird.jump()
 
-        base.move() # moving base on game window
+def eval_genome_batch(genomes, config, courses, geometric=False, decision_interval=1, early_stop=True, frame_cap=0,
+                      species=None):
+    """
+    worker side of ParallelGenomeEvaluator: plays headless games with a batch of genomes.
+    A bird's fitness does not depend on the other birds, so batches played on the same
+    pipe courses give the same fitness as playing the whole generation together.
+    :param genomes: list of genomes
+    :param config: neat config
+    :param courses: list of Course, the same for every batch of a generation
+    :param geometric: bird/pipe collision by rectangles instead of pixel perfect
+    :param decision_interval: frames between two network decisions, see play
+    :param early_stop: stop playing genomes that are not going to be among the elites of their species within
+                       the batch, see play_courses. The batch holds part of each species, so this stops fewer
+                       genomes than playing the whole generation together would.
+    :param frame_cap: most frames a genome plays over all the courses, 0 for no cap
+    :param species: species key of each genome (list of int), None for one species
+    :return: fitness of each genome averaged over the courses (list), index of the best genome when a game
+             got past MAX_SCORE (None otherwise), number of frames played, whether each genome played
+             every course (list), what the profiler recorded (None when it is off)
+    """
+    setup(True) # a spawned worker imported this module afresh
+    nets = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes]
+    elitism = config.reproduction_config.elitism if early_stop else 0
+    fitness, leader, frames, complete = play_courses(nets, courses, geometric=geometric, decision_interval=decision_interval,
+                                                     elitism=elitism, species=species, frame_cap=frame_cap)
+    recorded = profiler.take() if profiler.enabled else None # timings stay in this process otherwise
+    return fitness, leader, frames, complete, recorded
 
-        rem = [] # list of removed pipes
-        add_pipe = False
-        for pipe in pipes: # to check for more than 1 pipe
-            pipe.move() # moving pipes on game window
-            
-            # check for collision of all birds with pipes
-            for bird in birds:
-                if pipe.collide(bird, win): #checking for collision of bird with pipe
-                    ge[birds.index(bird)].fitness -= 1 # every time a bird hits pipe -1 fitness is removed from that bird
-                    nets.pop(birds.index(bird)) # remove NN of bird that has collided
-                    ge.pop(birds.index(bird)) # remove genome of bird that has collided
-                    birds.pop(birds.index(bird)) # remove bird that has collided
-
-            # Checking position of pipe
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0: #remove pipe when it passes a certain location on screen
-                rem.append(pipe) #removing pipe 
-            
-            # Checking if pipe is passed and addition of new pipe
-            if not pipe.passed and pipe.x < bird.x: #check if bird has passes the pipe
-                pipe.passed = True #check if bird is passed a pipe
-                add_pipe = True #if pipe is passed by bird we add a new pipe
 
-        # Keeping track of new pipes and score variable
-        if add_pipe: #adding new pipes
-            score += 1 #adding score when bird passes through a pipe
-            for genome in ge:
-                genome.fitness += 5 #increase fitness when bird passes through a pipe
-            pipes.append(Pipe(WIN_WIDTH)) #adding new pipe at the end of game window
+class ParallelGenomeEvaluator:
+    """
+    Evaluates a generation across a pool of worker processes, each one
+    playing a headless game with its share of the genomes
+    """
 
-        for r in rem: #remove pipe when a bird passes through it
-            pipes.remove(r) # getting rid of removed pipes
+    def __init__(self, num_workers, courses=1, seed=None, cache=None, geometric=False, decision_interval=1,
+                 early_stop=True, frame_cap=0, population=None):
+        """
+        starting the worker processes
+        :param num_workers: number of processes (int)
+        :param courses: number of pipe courses every genome plays
+        :param seed: int to play the same courses every generation, None for new ones
+        :param cache: FitnessCache of networks already played, None to play every genome
+        :param geometric: bird/pipe collision by rectangles instead of pixel perfect
+        :param decision_interval: frames between two network decisions, see play
+        :param early_stop: stop playing genomes that are not going to be among the elites of their species, see play_courses
+        :param frame_cap: most frames a genome plays over all the courses, 0 for no cap
+        :param population: the neat.Population being run, for the genomes' species (None for one species)
+        :return: None
+        """
+        self.num_workers = num_workers
+        self.courses = courses
+        self.seed = seed
+        self.cache = cache
+        self.geometric = geometric
+        self.decision_interval = decision_interval
+        self.early_stop = early_stop
+        self.frame_cap = frame_cap
+        self.population = population
+        self.pool = multiprocessing.Pool(num_workers)
+
+    def eval_genomes(self, genomes, config):
+        """
+        same as eval_genomes, with the genomes split in one batch per worker
+        :param genomes: list of (genome_id, genome)
+        :param config: neat config
+        :return: None
+        """
+        global gen
+        gen += 1
+
+        courses = make_courses(self.courses, self.seed) # the same pipe courses for the whole generation
+        nets = [neat.nn.FeedForwardNetwork.create(genome, config) for _, genome in genomes] if self.cache is not None else None
+        todo, keys = lookup_fitness([genome for _, genome in genomes], nets, courses, self.cache)
+        if not todo:
+            return
+
+        size = -(-len(todo) // self.num_workers) # genomes per batch, rounded up
+        batches = [todo[i:i + size] for i in range(0, len(todo), size)] # indices into genomes
+
+        start = time.perf_counter()
+        species = species_of(genomes, self.population)
+        results = self.pool.starmap(eval_genome_batch, [([genomes[i][1] for i in batch], config, courses, self.geometric,
+                                                         self.decision_interval, self.early_stop, self.frame_cap,
+                                                         [species[i] for i in batch]) for batch in batches])
+
+        best = None
+        frames = 0
+        for batch, (fitness, leader, batch_frames, complete, recorded) in zip(batches, results):
+            for i, value, played_all in zip(batch, fitness, complete):
+                genomes[i][1].fitness = value
+                if self.cache is not None and played_all: # the worst case of a stopped genome depends on the rest of the batch
+                    self.cache.put(keys[i], value)
+            if leader is not None and (best is None or genomes[batch[leader]][1].fitness > best.fitness):
+                best = genomes[batch[leader]][1] # fittest of the batch leaders, first batch on ties
+            frames = max(frames, batch_frames) # frames of the longest batch, over all courses
+            if recorded is not None:
+                profiler.merge(recorded)
+
+        # put best bird in pickle file
+        if best is not None:
+            save_best(neat.nn.FeedForwardNetwork.create(best, config))
+
+        elapsed = time.perf_counter() - start
+        print("Simulated {} frames on {} workers in {:.2f}s".format(frames, len(batches), elapsed))
+
+    def close(self):
+        """
+        stopping the worker processes
+        :return: None
+        """
+        self.pool.close()
+        self.pool.join()
 
-        
-        for bird in birds: # Multiple birds in population and check each bird if it hits ground
-            if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50: # Checking if bird hits the ground and check if bird above the screen
-                nets.pop(birds.index(bird)) # remove NN of bird that hit ground
-                ge.pop(birds.index(bird)) # remove genome of bird that hit ground
-                birds.pop(birds.index(bird)) # remove bird that hit ground
 
-        draw_window(WIN, birds, pipes, base, score, gen, pipe_ind)
+class ProfileReporter(neat.reporting.BaseReporter):
+    """
+    Prints where the game loop spent its time at the end of every generation
+    """
 
-        # break generation score gets large enough and put best bird in pickle file
-        if score > 21:
-            pickle.dump(nets[0],open("best.pickle", "wb"))
-            break
-        
-        
-        
+    def post_evaluate(self, config, population, species, best_genome):
+        profiler.report("Frame profile") # before neat stops on the fitness threshold
 
 
-def run(config_file):
+def run(config_file, workers=0, courses=3, seed=None, cache_size=10000, geometric=False,
+        decision_interval=1, render_interval=1, render_top=0, density=False, checkpoint_interval=5, resume=False,
+        early_stop=True, frame_cap=0):
     """
     runs the NEAT algorithm to train a neural network to play flappy bird.
     :param config_file: location of config file
+    :param workers: number of processes to evaluate genomes on, 0 to run in this process
+    :param courses: number of pipe courses each genome plays per generation. With one course a
+                    lucky pipe sequence can carry a weak genome past fitness_threshold, so the
+                    threshold only stands for a robust genome with more than one course
+    :param seed: int to evaluate every generation on the same courses, None for new ones
+    :param cache_size: fitness values of played networks to remember, 0 to turn the cache off
+    :param geometric: bird/pipe collision by rectangles instead of pixel perfect
+    :param decision_interval: frames between two network decisions, see play
+    :param render_interval: frames between two drawn frames, see play
+    :param render_top: only draw this many of the fittest birds, 0 for every bird
+    :param density: also draw a strip of how many birds are alive at each height
+    :param checkpoint_interval: generations between two checkpoints, 0 for none
+    :param resume: carry on from the newest checkpoint that can be read, if there is one
+    :param early_stop: stop playing genomes that are not going to be among the elites of their species, see play_courses
+    :param frame_cap: most frames a genome plays over all the courses, 0 for no cap
     :return: None
     """
+    global gen
+    setup()
+
     # Loading all the defined configurations for NEAT.
     config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
                          neat.DefaultSpeciesSet, neat.DefaultStagnation,
                          config_file)
 
     # Creating the population, which is the top-level object for a NEAT run.
-    p = neat.Population(config)
+    store = CheckpointStore()
+    p = store.restore_latest(config) if resume else None
+    if p is None:
+        p = neat.Population(config)
+    gen = p.generation # generations shown on screen carry on after a resume
 
     # Adding a reporter to show progress in the terminal.
     p.add_reporter(neat.StdOutReporter(True))
     stats = neat.StatisticsReporter()
     p.add_reporter(stats)
-    p.add_reporter(neat.Checkpointer(5))
+    if checkpoint_interval > 0:
+        p.add_reporter(CheckpointReporter(p, checkpoint_interval, store=store, writer=writer))
+    if profiler.enabled:
+        p.add_reporter(ProfileReporter())
+
+    # Unchanged genomes (elites) replaying the same courses are looked up instead of played.
+    # Courses only repeat with a seed, so the cache is only used then.
+    cache = None
+    if seed is not None and cache_size > 0:
+        cache = FitnessCache(cache_size)
+        p.add_reporter(FitnessCacheReporter(cache))
 
     # Run for up to 3 generations.
-    winner = p.run(eval_genomes, 3)
+    try:
+        if workers:
+            evaluator = ParallelGenomeEvaluator(workers, courses, seed, cache, geometric, decision_interval, early_stop, frame_cap,
+                                                p)
+            try:
+                winner = p.run(evaluator.eval_genomes, 3)
+            finally:
+                evaluator.close()
+        else:
+            winner = p.run(functools.partial(eval_genomes, courses=courses, seed=seed, cache=cache, geometric=geometric,
+                                             decision_interval=decision_interval, render_interval=render_interval,
+                                             render_top=render_top, density=density, early_stop=early_stop,
+                                             frame_cap=frame_cap, population=p), 3)
+    finally:
+        writer.wait() # the last checkpoint and best network are on disk before the run ends
 
     # show final stats
     print('\nBest genome:\n{!s}'.format(winner))
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train a NEAT agent to play flappy bird")
+    parser.add_argument("--headless", action="store_true", help="train without a window or frame limiting (same as FLAPPY_HEADLESS=1)")
+    parser.add_argument("--workers", type=int, default=0, help="evaluate genomes on this many processes (implies --headless)")
+    parser.add_argument("--courses", type=int, default=3, help="pipe courses each genome plays, fitness is the average; "
+                                                               "with 1 the fitness threshold can be met on one lucky course")
+    parser.add_argument("--no-early-stop", action="store_true", help="with several courses, play every genome on every course instead of stopping the ones behind their species' elites")
+    parser.add_argument("--frame-cap", type=int, default=0, help="most frames a genome plays over all its courses, 0 for no cap")
+    parser.add_argument("--seed", type=int, default=None, help="evaluate every generation on the same seeded courses")
+    parser.add_argument("--cache-size", type=int, default=10000, help="fitness values remembered for unchanged networks when --seed is set, 0 for none")
+    parser.add_argument("--geometric", action="store_true", help="cheaper bird/pipe collision by rectangles instead of pixel perfect")
+    parser.add_argument("--decision-interval", type=int, default=1, help="ask the networks every N frames instead of every frame")
+    parser.add_argument("--render-interval", type=int, default=1, help="draw every M frames, the frames in between run unthrottled")
+    parser.add_argument("--render-top", type=int, default=0, help="only draw the K fittest birds, 0 for every bird")
+    parser.add_argument("--render-best", action="store_true", help="only draw the fittest bird (same as --render-top 1)")
+    parser.add_argument("--density", action="store_true", help="draw a strip of how many birds are alive at each height")
+    parser.add_argument("--checkpoint-interval", type=int, default=5, help="save a checkpoint every N generations, 0 for none")
+    parser.add_argument("--resume", action="store_true", help="carry on from the newest valid checkpoint in the working directory")
+    parser.add_argument("--profile", action="store_true", help="time every phase of the game loop and print a summary per generation (same as FLAPPY_PROFILE=1)")
+    args = parser.parse_args()
+
+    if args.headless or args.workers:
+        HEADLESS = True
+        os.environ["FLAPPY_HEADLESS"] = "1" # worker processes that import this module again stay headless too
+
+    # Phase timing of the game loop, summarized after every generation.
+    if args.profile:
+        os.environ["FLAPPY_PROFILE"] = "1" # read by the profiler module, in this process and in workers
+        profiler.enabled = True
+
     # Determine path to configuration file. 
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config-feedforward.txt')
-    run(config_path)
\ No newline at end of file
+    run(config_path, args.workers, args.courses, args.seed, args.cache_size, args.geometric,
+        args.decision_interval, args.render_interval, 1 if args.render_best else args.render_top, args.density,
+        args.checkpoint_interval, args.resume, not args.no_early_stop, args.frame_cap)
\ No newline at end of file
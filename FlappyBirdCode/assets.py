@@ -0,0 +1,90 @@
+"""
+Game images and sounds, loaded on first use.
+
+Both game scripts used to open the window and load every image from a path
+relative to the working directory as soon as they were imported. Now nothing
+is loaded until a script's setup() asks an Assets object for it. Files are
+found relative to this package, and every surface is loaded, scaled and
+converted only once.
+
+There are two profiles:
+- windowed: surfaces are converted to the display format for fast blitting, so
+  the window must be open before the first asset is loaded
+- headless: surfaces are left as loaded and no display is needed. Masks are the
+  same either way, so collision is the same.
+"""
+import os #paths relative to the package
+import functools #cached assets
+import pygame #loading images and sounds
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def asset_path(*parts):
+    """
+    path of a file shipped with the game
+    :param parts: path inside the package, e.g. ("imgs", "bird1.png")
+    :return: str
+    """
+    return os.path.join(HERE, *parts)
+
+
+class Assets:
+    """
+    The images of the game for one profile, loaded the first time each is used
+    """
+
+    def __init__(self, headless=False):
+        """
+        :param headless: leave surfaces unconverted, no display needed
+        :return: None
+        """
+        self.headless = headless
+
+    def load_image(self, name, convert="alpha"):
+        """
+        loads an image from the imgs folder
+        :param name: file name inside imgs (str)
+        :param convert: "alpha" to convert keeping transparency, "opaque" without it, None to leave it as loaded
+        :return: pygame Surface
+        """
+        image = pygame.image.load(asset_path("imgs", name))
+        if self.headless or convert is None:
+            return image # convert needs a display; masks are the same either way
+        return image.convert_alpha() if convert == "alpha" else image.convert()
+
+    @functools.cached_property
+    def pipe(self):
+        return pygame.transform.scale2x(self.load_image("pipe.png")) # bottom pipe
+
+    @functools.cached_property
+    def pipe_top(self):
+        return pygame.transform.flip(self.pipe, False, True) # top pipe, flipped once
+
+    @functools.cached_property
+    def background(self):
+        return pygame.transform.scale(self.load_image("bg.png", "opaque"), (600, 900)) # opaque, so no alpha needed
+
+    @functools.cached_property
+    def birds(self):
+        return [pygame.transform.scale2x(self.load_image("bird" + str(x) + ".png", None)) for x in range(1,4)] # three frames of flapping
+
+    @functools.cached_property
+    def base(self):
+        return pygame.transform.scale2x(self.load_image("base.png"))
+
+
+profiles = {} # headless -> Assets
+
+
+def get_assets(headless=False):
+    """
+    the assets of a profile, shared by everything in the process
+    :param headless: the headless profile instead of the windowed one
+    :return: Assets
+    """
+    assets = profiles.get(headless)
+    if assets is None:
+        assets = profiles[headless] = Assets(headless)
+    return assets
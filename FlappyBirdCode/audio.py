@@ -0,0 +1,64 @@
+"""
+Game sounds.
+
+The clips in gallery/audio are decoded once, when the pool is loaded, and each
+one plays on a mixer channel of its own, so a sound can only cut off an earlier
+play of itself and never another sound. A sound asked for again sooner than its
+MIN_INTERVAL is skipped: the bird calls for the swoosh on every tick of a dive,
+which used to restart the clip over and over.
+
+A pool that is not loaded (or loaded with enabled=False) plays nothing and
+never touches the mixer, for headless and benchmark runs.
+"""
+import time #rate limiting
+import pygame #mixer
+from assets import asset_path #clips shipped with the game
+
+
+CLIPS = ("die", "hit", "point", "swoosh", "wing") # gallery/audio/<name>.wav
+MIN_INTERVAL = {"wing": 0.1, "swoosh": 0.5, "hit": 0.5} # seconds between two plays of a sound, 0 for the others
+
+
+class SoundPool:
+    """
+    The game's sounds, each on a dedicated mixer channel
+    """
+
+    def __init__(self):
+        self.enabled = False # nothing is played until load
+        self.sounds = {} # name -> pygame Sound
+        self.channels = {} # name -> pygame Channel
+        self.last_played = {} # name -> perf_counter time
+
+    def load(self, enabled=True):
+        """
+        starts the mixer and decodes every clip, only the first time it is called
+        :param enabled: False to stay silent without starting the mixer
+        :return: None
+        """
+        if self.sounds or not enabled:
+            return
+        try:
+            pygame.mixer.init()  # pygame sound mixer init
+        except pygame.error: # no audio device, play on without sound
+            return
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), len(CLIPS)))
+        pygame.mixer.set_reserved(len(CLIPS)) # Sound.play without a channel never takes these
+        for i, name in enumerate(CLIPS):
+            self.sounds[name] = pygame.mixer.Sound(asset_path("gallery", "audio", name + ".wav"))
+            self.channels[name] = pygame.mixer.Channel(i)
+        self.enabled = True
+
+    def play(self, name):
+        """
+        plays a sound on its channel, unless it played too recently
+        :param name: one of CLIPS
+        :return: None
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if now - self.last_played.get(name, float("-inf")) < MIN_INTERVAL.get(name, 0):
+            return
+        self.last_played[name] = now
+        self.channels[name].play(self.sounds[name])
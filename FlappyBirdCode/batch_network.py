@@ -0,0 +1,125 @@
+"""
+Batched evaluation of a whole generation of NEAT feed forward networks.
+
+neat.nn.FeedForwardNetwork.activate walks one network's graph in pure Python.
+BatchNetwork copies the node_evals of every network of a generation into padded
+NumPy arrays once, then evaluates any set of those networks in one go, node by
+node and link by link in the same order neat uses, so the outputs (and therefore
+the jump decisions) are the same as calling activate on each network.
+
+The NumPy calls cost a fixed few tens of microseconds per frame, so when only a
+handful of networks are asked for (the last birds of a generation) they are run
+one by one with activate instead, which is cheaper there.
+"""
+import numpy as np #arrays for the whole generation
+
+
+# numpy versions of the neat activation functions, with the same scaling and clamping
+ACTIVATIONS = {
+    "tanh_activation": lambda z: np.tanh(np.maximum(np.minimum(2.5 * z, 60.0), -60.0)),
+    "sigmoid_activation": lambda z: 1.0 / (1.0 + np.exp(-np.maximum(np.minimum(5.0 * z, 60.0), -60.0))),
+    "relu_activation": lambda z: np.where(z > 0.0, z, 0.0),
+    "identity_activation": lambda z: z,
+    "clamped_activation": lambda z: np.clip(z, -1.0, 1.0),
+}
+ACTIVATION_NAMES = list(ACTIVATIONS)
+
+MIN_BATCH = 16 # fewer networks than this are activated one by one
+
+
+class BatchNetwork:
+    """
+    A generation of FeedForwardNetworks compiled into padded arrays.
+
+    Each network gets one row. Columns of the value table are the inputs, then one
+    column per evaluated node (in neat's evaluation order), then a column that is
+    always 0 which padding links and unconnected outputs point at.
+    """
+
+    def __init__(self, nets):
+        """
+        compiling the networks
+        :param nets: list of neat.nn.FeedForwardNetwork sharing the same inputs and outputs
+        :return: None
+        """
+        self.nets = nets
+        self.num_inputs = len(nets[0].input_nodes)
+        self.num_outputs = len(nets[0].output_nodes)
+        self.num_nodes = max(len(net.node_evals) for net in nets)
+        max_links = max([len(links) for net in nets for *_, links in net.node_evals] or [0])
+        self.zero = self.num_inputs + self.num_nodes # the always 0 column
+
+        size = (len(nets), self.num_nodes)
+        self.sources = np.full(size + (max_links,), self.zero, dtype=np.int64) #value column each link reads
+        self.weights = np.zeros(size + (max_links,), dtype=np.float64) #weight of each link
+        self.bias = np.zeros(size, dtype=np.float64)
+        self.response = np.ones(size, dtype=np.float64)
+        self.activation = np.zeros(size, dtype=np.int64) #index into ACTIVATION_NAMES
+        self.outputs = np.full((len(nets), self.num_outputs), self.zero, dtype=np.int64) #value column of each output
+
+        for row, net in enumerate(nets):
+            columns = {key: col for col, key in enumerate(net.input_nodes)}
+            for j, (node, act_func, agg_func, bias, response, links) in enumerate(net.node_evals):
+                if agg_func.__name__ != "sum_aggregation" or act_func.__name__ not in ACTIVATIONS:
+                    raise ValueError("unsupported node {} ({}, {})".format(node, agg_func.__name__, act_func.__name__))
+                for k, (i, w) in enumerate(links):
+                    self.sources[row, j, k] = columns[i]
+                    self.weights[row, j, k] = w
+                self.bias[row, j] = bias
+                self.response[row, j] = response
+                self.activation[row, j] = ACTIVATION_NAMES.index(act_func.__name__)
+                columns[node] = self.num_inputs + j
+            for o, key in enumerate(net.output_nodes):
+                self.outputs[row, o] = columns.get(key, self.zero) # outputs nothing feeds stay at 0
+
+        self.selected = None # rows of the last call and the arrays gathered for them
+
+    def select(self, rows):
+        """
+        gathering the arrays of some networks, reused while the same rows are asked for
+        (the alive birds only change when birds die)
+        :param rows: int array, which networks to evaluate
+        :return: tuple of arrays for those rows
+        """
+        if self.selected is not None and np.array_equal(self.selected[0], rows):
+            return self.selected[1]
+
+        activation = self.activation[rows]
+        # activations used in each node column, so a column using only one needs no masking
+        codes = [np.unique(activation[:, j]) for j in range(self.num_nodes)]
+        arrays = (np.arange(len(rows)), self.sources[rows], self.weights[rows], self.bias[rows],
+                  self.response[rows], activation, codes, self.outputs[rows])
+        self.selected = (rows.copy(), arrays)
+        return arrays
+
+    def activate(self, inputs, rows):
+        """
+        evaluating several networks, one input vector each
+        :param inputs: float array (len(rows), num_inputs)
+        :param rows: int array, which networks to evaluate
+        :return: float array (len(rows), num_outputs)
+        """
+        rows = np.asarray(rows)
+        if len(rows) < MIN_BATCH:
+            return np.array([self.nets[i].activate(x) for i, x in zip(rows.tolist(), np.asarray(inputs).tolist())],
+                            dtype=np.float64).reshape(len(rows), self.num_outputs)
+
+        r, sources, weights, bias, response, activation, codes, outputs = self.select(rows)
+        values = np.zeros((len(rows), self.zero + 1), dtype=np.float64)
+        values[:, :self.num_inputs] = inputs
+
+        for j in range(self.num_nodes):
+            # add the links up one at a time, in neat's order, so the sums round the same way
+            s = np.zeros(len(rows), dtype=np.float64)
+            for k in range(sources.shape[2]):
+                s += values[r, sources[:, j, k]] * weights[:, j, k]
+            z = bias[:, j] + response[:, j] * s
+
+            if len(codes[j]) == 1:
+                values[:, self.num_inputs + j] = ACTIVATIONS[ACTIVATION_NAMES[codes[j][0]]](z)
+            else:
+                for code in codes[j]:
+                    same = activation[:, j] == code
+                    values[same, self.num_inputs + j] = ACTIVATIONS[ACTIVATION_NAMES[code]](z[same])
+
+        return values[r[:, None], outputs]
@@ -0,0 +1,350 @@
+"""
+Benchmarks for the simulation and training hot paths.
+
+    python benchmark.py                  # run, write benchmark_results.json and compare with benchmark_baseline.json
+    python benchmark.py --save-baseline  # run and store the results as the new baseline
+    python benchmark.py --sizes 50 500   # only some population sizes
+
+Everything runs without a window (SDL's dummy video driver) on fixed seeds, so
+two runs on the same machine play exactly the same games. A result more than
+--tolerance worse than the baseline is reported as a regression and makes the
+script exit with status 1.
+
+Timings are only comparable on one machine. Every timed run of a benchmark
+comes right after a short plain Python reference loop, and each result keeps
+the reference time of its fastest run. Before comparing, each baseline result
+is scaled by how much slower or faster its reference loop ran than when the
+baseline was saved, so a machine that speeds up or slows down during a run (a
+shared or throttled CPU) is measured against itself. That takes out most of
+the difference between two machines, but not all of it (numpy and SDL scale
+differently from the interpreter). Before trusting a regression on a new
+machine, record a baseline there with --save-baseline from the commit you
+compare against. The baseline is only ever written whole by --save-baseline:
+results from different runs must not be mixed in one file.
+"""
+import os #paths
+import sys #exit status
+import json #results files
+import time #timing
+import random #fixed seeds
+import statistics #median of the reference ratios
+import argparse #command line options
+import functools #binding evaluation options for neat
+import tempfile #somewhere to let eval_genomes write best.pickle
+import importlib.util #loading NEAT-FlappyBird.py, whose name is not a module name
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # draw_window needs a display, but not a real one
+
+import pygame #game module
+import neat #NEAT algorithm module
+
+from course import Course
+from champion import CompiledNetwork, NETWORK
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEED = 1 # seed of the pipe course and of the genomes
+RESULTS = os.path.join(HERE, "benchmark_results.json") # ignored by git
+REFERENCE_LOOPS = 50000 # iterations of the reference loop timed before every run
+REFERENCE = "reference_loop" # result the others are scaled by before comparing
+BASELINE = os.path.join(HERE, "benchmark_baseline.json")
+
+
+def load_game():
+    """
+    imports NEAT-FlappyBird.py and sets it up with a dummy display
+    :return: module
+    """
+    spec = importlib.util.spec_from_file_location("neat_flappybird", os.path.join(HERE, "NEAT-FlappyBird.py"))
+    game = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(game)
+    game.setup(headless=False) # fonts and converted images for draw_window
+    game.WIN = None # eval_genomes plays headless
+    return game
+
+
+def load_config(pop_size=None):
+    """
+    the training config, optionally with another population size
+    :param pop_size: int, None to keep the config's
+    :return: neat config
+    """
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                os.path.join(HERE, "config-feedforward.txt"))
+    if pop_size is not None:
+        config.pop_size = pop_size
+    return config
+
+
+def make_nets(config, count):
+    """
+    networks of a population that has mutated a few times, so they don't all look alike
+    :param config: neat config
+    :param count: number of networks
+    :return: list of neat.nn.FeedForwardNetwork
+    """
+    random.seed(SEED)
+    config.pop_size = count
+    genomes = list(neat.Population(config).population.values())
+    for genome in genomes:
+        for _ in range(4):
+            genome.mutate(config.genome_config)
+    return [neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes]
+
+
+def reference_loop(loops=REFERENCE_LOOPS):
+    """
+    a plain Python loop with no game code in it, to tell how fast the machine is right now
+    :param loops: iterations (int)
+    :return: microseconds per loop
+    """
+    start = time.perf_counter()
+    total = 0
+    for i in range(loops):
+        total += i * i % 7
+    return (time.perf_counter() - start) / loops * 1e6
+
+
+last_reference = None # reference loop time (us/loop) the last best_time is to be scaled by
+
+
+def best_time(func, repeat):
+    """
+    runs a function a few times, each time right after the reference loop, so
+    both are timed at the same machine speed. A shared CPU keeps changing speed,
+    so the run to run ratio of the two is steadier than either time: the
+    reference time left in last_reference is the one that gives the fastest run
+    the median of those ratios.
+    :param func: function without arguments
+    :param repeat: number of runs
+    :return: fastest run in seconds
+    """
+    global last_reference
+    times = []
+    ratios = []
+    for _ in range(repeat):
+        reference = reference_loop()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+        ratios.append(times[-1] / reference)
+    last_reference = min(times) / statistics.median(ratios)
+    return min(times)
+
+
+def bench_reference():
+    """
+    the reference loop on its own, the machine speed of the whole run
+    :return: microseconds per loop
+    """
+    return min(reference_loop() for _ in range(5))
+
+
+def bench_play(game, config, size):
+    """
+    frames per second of the training game loop for a population size
+    :return: frames/sec
+    """
+    nets = make_nets(config, size)
+    course = Course(SEED)
+    frames = game.play(nets, course)[3]
+    return frames / best_time(lambda: game.play(nets, course), 3)
+
+
+def bench_collide(game):
+    """
+    cost of PipeRing.collide over every position of pipes crossing the screen
+    :return: microseconds per call
+    """
+    rng = random.Random(SEED)
+    pipes = game.PipeRing(game.Pipe.PIPE_TOP, game.Pipe.PIPE_BOTTOM, game.Pipe.GAP)
+    cases = [] # (pipe height, [(bird, pipe x)])
+    for _ in range(50):
+        height = rng.randrange(50, 450)
+        cases.append((height, [(game.Bird(230, rng.uniform(height - 60, height + pipes.gap + 10)), x)
+                               for x in range(700, -pipes.width, -5)]))
+
+    def run():
+        for height, positions in cases:
+            pipes.reset()
+            slot = pipes.spawn(700, height)
+            for bird, x in positions:
+                pipes.x[slot] = x
+                pipes.collide(slot, bird)
+    return best_time(run, 5) / sum(len(positions) for _, positions in cases) * 1e6
+
+
+def bench_move(game):
+    """
+    cost of Bird.move, jumping every 20 ticks
+    :return: microseconds per call
+    """
+    bird = game.Bird(230, 350)
+
+    def run():
+        for tick in range(10000):
+            if tick % 20 == 0:
+                bird.jump()
+            bird.move()
+    return best_time(run, 5) / 10000 * 1e6
+
+
+def bench_activate(config):
+    """
+    cost of FeedForwardNetwork.activate
+    :return: microseconds per call
+    """
+    nets = make_nets(config, 50)
+    rng = random.Random(SEED)
+    inputs = [(rng.uniform(0, 700), rng.uniform(0, 400), rng.uniform(0, 400)) for _ in range(200)]
+
+    def run():
+        for net in nets:
+            for x in inputs:
+                net.activate(x)
+    return best_time(run, 5) / (len(nets) * len(inputs)) * 1e6
+
+
+def bench_champion():
+    """
+    decisions of the shipped champion, compiled
+    :return: decisions/sec
+    """
+    network = CompiledNetwork.load(NETWORK) # not one a training run left in the working directory
+    rng = random.Random(SEED)
+    inputs = [(rng.uniform(0, 700), rng.uniform(0, 400), rng.uniform(0, 400)) for _ in range(10000)]
+    evaluate = network.evaluate
+
+    def run():
+        for y, top, bottom in inputs:
+            evaluate(y, top, bottom)
+    return len(inputs) / best_time(run, 5)
+
+
+def bench_draw(game):
+    """
+    cost of draw_window with 50 birds in the air
+    :return: milliseconds per call
+    """
+    win = pygame.display.get_surface()
+    birds = game.BirdPopulation(50, 230, 350, [img.get_height() for img in game.bird_images])
+    birds.y += [i * 6 for i in range(50)] # spread them out
+    pipes = game.PipeRing(game.Pipe.PIPE_TOP, game.Pipe.PIPE_BOTTOM, game.Pipe.GAP)
+    pipes.spawn(400, 200)
+    pipes.spawn(700, 300)
+    base = game.Base(game.FLOOR)
+
+    def run():
+        for _ in range(50):
+            game.draw_window(win, birds, pipes, base, 3, 1, 0)
+    return best_time(run, 3) / 50 * 1e3
+
+
+def bench_generations(game, generations=5):
+    """
+    generations per second of the NEAT run (reporters and checkpoints left out)
+    :return: generations/sec
+    """
+    config = load_config()
+    config.fitness_threshold = float("inf") # always run every generation
+
+    def run():
+        random.seed(SEED) # the same run every time
+        neat.Population(config).run(functools.partial(game.eval_genomes, seed=SEED), generations)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch) # keep the trained best.pickle
+        try:
+            elapsed = best_time(run, 3)
+        finally:
+            os.chdir(cwd)
+    return generations / elapsed
+
+
+def run_benchmarks(sizes):
+    """
+    runs every benchmark
+    :param sizes: population sizes for the game loop
+    :return: dict of name -> {"value", "unit", "higher_is_better", "reference"}
+    """
+    game = load_game()
+    config = load_config()
+    results = {}
+
+    def record(name, value, unit, higher_is_better):
+        results[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better,
+                         "reference": value if name == REFERENCE else last_reference}
+        print("{:<24} {:>12.2f} {}".format(name, value, unit))
+
+    record(REFERENCE, bench_reference(), "us/loop", False)
+    for size in sizes:
+        record("play_fps_{}".format(size), bench_play(game, config, size), "frames/sec", True)
+    record("pipe_collide", bench_collide(game), "us/call", False)
+    record("bird_move", bench_move(game), "us/call", False)
+    record("network_activate", bench_activate(config), "us/call", False)
+    record("champion_decisions", bench_champion(), "decisions/sec", True)
+    record("draw_window", bench_draw(game), "ms/call", False)
+    record("run_generations", bench_generations(game), "generations/sec", True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    finds results that got worse than the baseline, once each baseline result
+    is scaled to the speed of this machine by the reference loop timed with it
+    :param results: dict from run_benchmarks
+    :param baseline: dict from an earlier run
+    :param tolerance: allowed slowdown (0.25 is 25%)
+    :return: list of regression messages
+    """
+    machine = 1.0 # how many times slower this machine runs the reference loop, for results saved without their own
+    if REFERENCE in baseline:
+        machine = results[REFERENCE]["value"] / baseline[REFERENCE]["value"]
+        print("{:<24} {:>12.2f}x the baseline machine's time".format(REFERENCE, machine))
+    else:
+        print("The baseline has no {}, comparing raw timings".format(REFERENCE))
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            print("{:<24} not in the baseline".format(name))
+            continue
+        if name == REFERENCE:
+            continue
+        old = baseline[name]["value"]
+        new = result["value"]
+        scale = machine
+        if baseline[name].get("reference") and result.get("reference"):
+            scale = result["reference"] / baseline[name]["reference"] # machine speed while this one ran
+        # how many times slower than the baseline, whatever the unit, on the same machine
+        slowdown = old / (new * scale) if result["higher_is_better"] else new / (old * scale)
+        print("{:<24} {:>12.2f} -> {:>12.2f} {} ({:+.0%})".format(name, old, new, result["unit"], 1 / slowdown - 1))
+        if slowdown > 1 + tolerance:
+            regressions.append("{} regressed from {:.2f} to {:.2f} {}".format(name, old, new, result["unit"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the flappy bird simulation and training hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000], help="population sizes for the game loop")
+    parser.add_argument("--output", default=RESULTS, help="where to write the results")
+    parser.add_argument("--baseline", default=BASELINE, help="results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a result counts as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print("Saved baseline to {}".format(args.baseline))
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print("REGRESSION: " + message)
+        sys.exit(1 if regressions else 0)
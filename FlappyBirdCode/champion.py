@@ -0,0 +1,276 @@
+"""
+Plays the game with a trained champion network.
+
+    python champion.py                    # the champion plays FlappyBird.py in a window
+    python champion.py --headless -n 10   # ten games without a window, with scores and decisions/sec
+    python champion.py --bench            # decisions/sec of the compiled network against neat's activate
+    python champion.py --convert          # write best.net next to the best.pickle found
+
+Training writes best.net and best.pickle to the directory it runs in, so the
+champion is looked for there first and then among the files the game ships
+with. best.net, the versioned binary network format of the checkpoint module,
+is read when there is one. best.pickle is only read through an
+unpickler that refuses anything but a neat FeedForwardNetwork and neat's own
+activation and aggregation functions, so a planted pickle cannot run code.
+
+The network is then compiled into one Python function: nodes in neat's
+evaluation order, each a single expression with its weights, bias and
+response written in as constants. A decision builds no lists or dicts and
+looks nothing up by node key, and gives exactly the outputs of
+FeedForwardNetwork.activate.
+"""
+import os #paths and the dummy video driver
+import sys #exit status
+import math #finite weight check
+import time #decisions/sec
+import random #pipe heights of headless games
+import pickle #reading best.pickle, restricted
+import argparse #command line options
+
+import neat #activation functions, and the network best.pickle holds
+import FlappyBird #the game the champion plays
+from assets import asset_path #files shipped with the game
+from checkpoint import NETWORK_MAGIC, build_network, pack_network, unpack_network #versioned network files
+
+
+NETWORK = asset_path("best.net") # the champion the game ships with
+PICKLE = asset_path("best.pickle") # the shipped champion as the repo used to ship it
+ALLOWED = {("neat.nn.feed_forward", "FeedForwardNetwork")} # everything best.pickle may name besides neat functions
+
+
+class NetworkUnpickler(pickle.Unpickler):
+    """
+    Unpickles a FeedForwardNetwork and nothing else
+    """
+
+    def find_class(self, module, name):
+        if (module, name) in ALLOWED or (module == "neat.activations" and name.endswith("_activation")) \
+                or (module == "neat.aggregations" and name.endswith("_aggregation")):
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError("{}.{} is not allowed in a network pickle".format(module, name))
+
+
+def find_network(pickled=False):
+    """
+    the champion file to play with: what training left in the working directory,
+    else what the game ships with; best.net before best.pickle in each
+    :param pickled: only look for best.pickle
+    :return: path
+    """
+    names = ["best.pickle"] if pickled else ["best.net", "best.pickle"]
+    candidates = names + [asset_path(name) for name in names]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return candidates[-1] # reading it reports the missing file
+
+
+def read_network(path):
+    """
+    reads a network file, binary or pickled
+    :param path: best.net or best.pickle
+    :return: (input keys, output keys, node_evals with activation and aggregation names)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(NETWORK_MAGIC):
+        return unpack_network(data)
+
+    with open(path, "rb") as f:
+        net = NetworkUnpickler(f).load()
+    if not isinstance(net, neat.nn.FeedForwardNetwork):
+        raise ValueError("{} holds a {}, not a FeedForwardNetwork".format(path, type(net).__name__))
+    return describe(net)
+
+
+def describe(net):
+    """
+    a FeedForwardNetwork with its functions replaced by their names
+    :param net: neat.nn.FeedForwardNetwork
+    :return: (input keys, output keys, node_evals with activation and aggregation names)
+    """
+    return list(net.input_nodes), list(net.output_nodes), [
+        (node, act.__name__.replace("_activation", ""), agg.__name__.replace("_aggregation", ""), bias, response, list(links))
+        for node, act, agg, bias, response, links in net.node_evals]
+
+
+class CompiledNetwork:
+    """
+    A FeedForwardNetwork compiled into a single function of its inputs
+    """
+
+    def __init__(self, inputs, outputs, node_evals):
+        """
+        compiling the network
+        :param inputs: input node keys
+        :param outputs: output node keys
+        :param node_evals: (node, activation name, aggregation name, bias, response, [(source, weight)]) in evaluation order
+        :return: None
+        """
+        activations = neat.activations.ActivationFunctionSet()
+        names = {key: "i{}".format(i) for i, key in enumerate(inputs)} # node key -> local variable
+        functions = {} # activation name -> global the function is bound to
+        lines = ["def evaluate({}):".format(", ".join(names[key] for key in inputs))]
+
+        for j, (node, activation, aggregation, bias, response, links) in enumerate(node_evals):
+            if aggregation != "sum":
+                raise ValueError("node {} uses {} aggregation, only sum is compiled".format(node, aggregation))
+            if activation not in functions:
+                if activations.get(activation) is None:
+                    raise ValueError("node {} uses unknown activation {}".format(node, activation))
+                functions[activation] = "act_" + activation
+            constants = [bias, response] + [w for _, w in links]
+            if not all(math.isfinite(c) for c in constants):
+                raise ValueError("node {} has a weight, bias or response that is not finite".format(node))
+
+            # sum() starts from 0 and adds left to right, so does this
+            total = " + ".join(["0"] + ["{} * {!r}".format(names[i], float(w)) for i, w in links])
+            names[node] = "n{}".format(j)
+            lines.append("    {} = {}({!r} + {!r} * ({}))".format(names[node], functions[activation], float(bias), float(response), total))
+
+        lines.append("    return ({},)".format(", ".join(names.get(key, "0.0") for key in outputs))) # outputs nothing feeds stay at 0
+        namespace = {name: activations.get(activation) for activation, name in functions.items()}
+        exec(compile("\n".join(lines), "<compiled network>", "exec"), namespace) # only numbers and names made above
+        self.source = "\n".join(lines)
+        self.description = (inputs, outputs, node_evals) # what it was compiled from
+        self.evaluate = namespace["evaluate"]
+        self.num_inputs = len(inputs)
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        the compiled champion
+        :param path: network file, None for the one find_network picks
+        :return: CompiledNetwork
+        """
+        return cls(*read_network(path or find_network()))
+
+
+class ChampionPilot:
+    """
+    Flies a bird with a compiled network, given to FlappyBird.main as its pilot
+    """
+
+    def __init__(self, network):
+        """
+        :param network: CompiledNetwork
+        :return: None
+        """
+        self.evaluate = network.evaluate
+        self.decisions = 0 # decisions made so far
+        self.seconds = 0.0 # time spent making them
+
+    def __call__(self, bird, pipes):
+        """
+        should the bird jump, with the inputs the network was trained on
+        :param bird: Bird object
+        :param pipes: PipeRing
+        :return: bool
+        """
+        slot = pipes.ahead_slot(bird.x)
+        y = bird.y
+        start = time.perf_counter()
+        jump = self.evaluate(y, abs(y - int(pipes.height[slot])), abs(y - int(pipes.bottom[slot])))[0] > 0.5
+        self.seconds += time.perf_counter() - start
+        self.decisions += 1
+        return jump
+
+    def rate(self):
+        """
+        decisions per second of network time
+        :return: float
+        """
+        return self.decisions / self.seconds if self.seconds else 0.0
+
+
+def play_headless(game, pilot, seed=0, max_score=100, max_ticks=100000):
+    """
+    a game of FlappyBird.py without drawing anything, the pilot flying
+    :param game: the FlappyBird module, set up
+    :param pilot: ChampionPilot
+    :param seed: seeds the pipe heights
+    :param max_score: the game stops once the bird gets this far (int)
+    :param max_ticks: the game stops after this many ticks (int)
+    :return: (score, ticks played)
+    """
+    random.seed(seed)
+    bird = game.Bird(230, 50)
+    base = game.Base(game.FLOOR)
+    pipes = game.PipeRing(game.Pipe.PIPE_TOP, game.Pipe.PIPE_BOTTOM, game.Pipe.GAP)
+    pipes.spawn(700)
+    score, lost, ticks = 0, False, 0
+    while ticks < max_ticks and score < max_score:
+        if not lost and pilot(bird, pipes):
+            bird.jump()
+        score, lost, dead = game.update(None, bird, pipes, base, score, lost)
+        ticks += 1
+        if dead:
+            break
+    return score, ticks
+
+
+def bench(network, calls=100000):
+    """
+    decisions per second of the compiled network and of neat's activate on the same inputs
+    :param network: CompiledNetwork
+    :param calls: decisions timed (int)
+    :return: (compiled decisions/sec, neat decisions/sec)
+    """
+    net = build_network(*network.description)
+    rng = random.Random(0)
+    cases = [(rng.uniform(0, 700), rng.uniform(0, 700), rng.uniform(0, 700)) for _ in range(1000)]
+    evaluate = network.evaluate
+
+    start = time.perf_counter()
+    for _ in range(calls // len(cases)):
+        for y, top, bottom in cases:
+            evaluate(y, top, bottom)
+    compiled = calls / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(calls // len(cases)):
+        for case in cases:
+            net.activate(case)
+    reference = calls / (time.perf_counter() - start)
+    return compiled, reference
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Let the trained champion play flappy bird")
+    parser.add_argument("--network", default=None, help="network file (best.net or a network pickle), by default the one training "
+                                                        "left in the working directory, else the shipped one")
+    parser.add_argument("--headless", action="store_true", help="play without a window and print scores and decisions/sec")
+    parser.add_argument("-n", "--games", type=int, default=1, help="headless games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first headless game, the next ones count up")
+    parser.add_argument("--max-score", type=int, default=100, help="stop a headless game at this score")
+    parser.add_argument("--bench", action="store_true", help="time decisions of the compiled network against neat's activate")
+    parser.add_argument("--convert", action="store_true", help="write best.net next to best.pickle (or the --network pickle)")
+    args = parser.parse_args()
+
+    if args.convert:
+        source = args.network or find_network(pickled=True)
+        target = os.path.join(os.path.dirname(source), "best.net")
+        with open(target, "wb") as f:
+            f.write(pack_network(build_network(*read_network(source))))
+        print("Wrote {}".format(target))
+        sys.exit(0)
+
+    network = CompiledNetwork.load(args.network)
+    if args.bench:
+        compiled, reference = bench(network)
+        print("compiled: {:.0f} decisions/sec, neat activate: {:.0f} decisions/sec ({:.1f}x)".format(compiled, reference, compiled / reference))
+        sys.exit(0)
+
+    pilot = ChampionPilot(network)
+    if args.headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # FlappyBird's setup opens a window, an invisible one will do
+        os.environ["FLAPPY_MUTE"] = "1"
+    win = FlappyBird.setup() # read the environment above
+    if not args.headless:
+        FlappyBird.main(win, pilot)
+    else:
+        for i in range(args.games):
+            start = time.perf_counter()
+            score, ticks = play_headless(FlappyBird, pilot, args.seed + i, args.max_score)
+            print("Game {}: score {} in {} ticks ({:.0f} ticks/sec)".format(i + 1, score, ticks, ticks / (time.perf_counter() - start)))
+        print("{} decisions, {:.0f} decisions/sec".format(pilot.decisions, pilot.rate()))
@@ -0,0 +1,588 @@
+"""
+Checkpoints of a NEAT run, and saved networks, in a compact binary format.
+
+neat.Checkpointer gzips a pickle of the whole population at the end of a
+generation, and training waits until the file is written. CheckpointReporter
+only takes a snapshot while training waits: the genomes, species, counters
+and random state packed into bytes. Compressing and writing the snapshot
+happens on a background thread while the next generation plays.
+
+Most checkpoints are deltas: elitism carries genomes into the next generation
+unchanged and under the same key, so a delta only stores the genomes that are
+not in the checkpoint before it, and the keys and fitness of the rest. Every
+full_interval-th checkpoint is full (every other one by default), so resuming
+reads at most that many files.
+
+File layout, little endian:
+
+    header   magic, version, kind (full or delta), generation, base generation,
+             body size, crc32 of the body
+    body     zlib compressed: name table, counters, random state, population
+             keys and fitness, genomes, species
+
+restore_latest resumes from the newest checkpoint that (with its chain of
+bases) is complete and passes its checksums, skipping damaged ones.
+
+Networks (best.net) use the same idea: a small versioned header and the
+node_evals of a FeedForwardNetwork, with activation and aggregation functions
+by name, so loading one never unpickles anything.
+"""
+import os #checkpoint files
+import re #checkpoint file names
+import math #NaN for missing fitness
+import time #timing snapshots and writes
+import zlib #compression and checksums
+import random #random state of the run
+import struct #binary layout
+import threading #background writes
+import queue #writes waiting for the writer thread
+from itertools import count #neat key counters
+
+import neat #genomes, species and networks
+
+
+MAGIC = b"FBCK" # checkpoint files
+NETWORK_MAGIC = b"FBNN" # network files
+VERSION = 1 # bumped whenever the layout changes, older readers refuse newer files
+FULL, DELTA = 0, 1 # checkpoint kinds
+NO_BASE = 0xFFFFFFFF # base generation of a full checkpoint
+
+HEADER = struct.Struct("<4sHBIIII") # magic, version, kind, generation, base, body size, crc32
+NETWORK_HEADER = struct.Struct("<4sHII") # magic, version, body size, crc32
+NODE = struct.Struct("<iddHH") # key, bias, response, activation, aggregation
+CONNECTION = struct.Struct("<iidB") # in node, out node, weight, enabled
+
+
+class Packer:
+    """
+    Builds a body from struct formats, with a table of the names it uses
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.names = {} # name -> index in the table
+
+    def pack(self, fmt, *values):
+        self.parts.append(struct.pack("<" + fmt, *values))
+
+    def array(self, code, values):
+        """
+        a count followed by that many values of one struct code
+        """
+        self.pack("I", len(values))
+        self.parts.append(struct.pack("<{}{}".format(len(values), code), *values))
+
+    def name(self, name):
+        """
+        index of a name in the table
+        """
+        index = self.names.get(name)
+        if index is None:
+            index = self.names[name] = len(self.names)
+        return index
+
+    def body(self):
+        """
+        the name table followed by everything packed
+        :return: bytes
+        """
+        table = [struct.pack("<H", len(self.names))]
+        for name in self.names: # insertion order is index order
+            encoded = name.encode()
+            table.append(struct.pack("<B", len(encoded)) + encoded)
+        return b"".join(table + self.parts)
+
+
+class Unpacker:
+    """
+    Reads a body written by Packer
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+        self.names = [self.string() for _ in range(self.unpack("H")[0])]
+
+    def unpack(self, fmt):
+        values = struct.unpack_from("<" + fmt, self.data, self.offset)
+        self.offset += struct.calcsize("<" + fmt)
+        return values
+
+    def array(self, code):
+        size = self.unpack("I")[0]
+        return list(self.unpack("{}{}".format(size, code)))
+
+    def records(self, record):
+        """
+        a count followed by that many records of a struct.Struct
+        """
+        size = self.unpack("I")[0]
+        end = self.offset + size * record.size
+        values = list(record.iter_unpack(self.data[self.offset:end]))
+        self.offset = end
+        return values
+
+    def string(self):
+        size = self.unpack("B")[0]
+        self.offset += size
+        return self.data[self.offset - size:self.offset].decode()
+
+
+def fitness_value(fitness):
+    """
+    a fitness as a float, NaN for None
+    """
+    return math.nan if fitness is None else fitness # children are not evaluated yet
+
+
+def fitness_or_none(value):
+    """
+    the fitness a float from fitness_value stands for
+    """
+    return None if math.isnan(value) else value
+
+
+def take_counter(counter, default):
+    """
+    the next value of an itertools.count without losing it
+    :param counter: itertools.count, None if not started
+    :param default: value when there is no counter
+    :return: (next value, a counter to use instead that still gives it)
+    """
+    if counter is None:
+        return default, None
+    value = next(counter)
+    return value, count(value)
+
+
+def pack_genome(packer, genome):
+    """
+    adds a genome (key, nodes and connections) to a body
+    """
+    packer.pack("I", genome.key)
+    nodes = list(genome.nodes.values())
+    packer.pack("I", len(nodes))
+    packer.parts.append(b"".join(NODE.pack(node.key, node.bias, node.response, packer.name(node.activation), packer.name(node.aggregation))
+                                 for node in nodes))
+    connections = list(genome.connections.values())
+    packer.pack("I", len(connections))
+    packer.parts.append(b"".join(CONNECTION.pack(c.key[0], c.key[1], c.weight, c.enabled) for c in connections))
+
+
+def unpack_genome(unpacker, genome_config, genome_type):
+    """
+    reads a genome added by pack_genome
+    :return: genome, without fitness
+    """
+    genome = genome_type(unpacker.unpack("I")[0])
+    for key, bias, response, activation, aggregation in unpacker.records(NODE):
+        node = genome_config.node_gene_type(key)
+        node.bias, node.response = bias, response
+        node.activation, node.aggregation = unpacker.names[activation], unpacker.names[aggregation]
+        genome.nodes[key] = node
+    for in_node, out_node, weight, enabled in unpacker.records(CONNECTION):
+        connection = genome_config.connection_gene_type((in_node, out_node))
+        connection.weight, connection.enabled = weight, bool(enabled)
+        genome.connections[(in_node, out_node)] = connection
+    return genome
+
+
+def snapshot(config, population, species_set, reproduction, base=None):
+    """
+    packs the state of a run at the end of a generation
+    :param config: neat config
+    :param population: dict of genome key -> genome, the next generation
+    :param species_set: neat DefaultSpeciesSet, speciated for that generation
+    :param reproduction: neat DefaultReproduction, for its genome key counter
+    :param base: keys of the genomes stored by the checkpoint before (set), None for a full checkpoint
+    :return: uncompressed body (bytes)
+    """
+    packer = Packer()
+
+    # counters, so a resumed run hands out the same keys the original would have
+    next_genome, reproduction.genome_indexer = take_counter(reproduction.genome_indexer, max(population) + 1)
+    next_species, species_set.indexer = take_counter(species_set.indexer, max(species_set.species, default=0) + 1)
+    next_node, config.genome_config.node_indexer = take_counter(config.genome_config.node_indexer, -1)
+    packer.pack("IIq", next_genome, next_species, next_node)
+
+    version, state, gauss = random.getstate()
+    packer.pack("B", version)
+    packer.array("I", state)
+    packer.pack("?d", gauss is not None, 0.0 if gauss is None else gauss)
+
+    keys = list(population)
+    packer.array("I", keys)
+    packer.array("d", [fitness_value(population[key].fitness) for key in keys])
+
+    stored = [population[key] for key in keys if base is None or key not in base]
+    packer.pack("I", len(stored))
+    for genome in stored:
+        pack_genome(packer, genome)
+
+    packer.pack("I", len(species_set.species))
+    for species in species_set.species.values():
+        packer.pack("IIIIdd", species.key, species.created, species.last_improved, species.representative.key,
+                    fitness_value(species.fitness), fitness_value(species.adjusted_fitness))
+        packer.array("d", species.fitness_history)
+        packer.array("I", list(species.members))
+    return packer.body()
+
+
+def write_checkpoint(path, body, kind, generation, base_generation=NO_BASE, level=6):
+    """
+    compresses a snapshot and writes it, atomically: a crash leaves the old file or the new one
+    :return: size of the file in bytes
+    """
+    compressed = zlib.compress(body, level)
+    data = HEADER.pack(MAGIC, VERSION, kind, generation, base_generation, len(compressed), zlib.crc32(compressed)) + compressed
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+    return len(data)
+
+
+def read_header(path):
+    """
+    the header of a checkpoint file, checked
+    :return: (kind, generation, base generation, compressed body)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError("{} is too short for a checkpoint".format(path))
+    magic, version, kind, generation, base, size, crc = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("{} is not a checkpoint".format(path))
+    if version > VERSION:
+        raise ValueError("{} is checkpoint version {}, this reader only knows up to {}".format(path, version, VERSION))
+    body = data[HEADER.size:]
+    if len(body) != size or zlib.crc32(body) != crc:
+        raise ValueError("{} is damaged (size or checksum mismatch)".format(path))
+    return kind, generation, base, body
+
+
+class CheckpointStore:
+    """
+    Checkpoint files of a run, named <prefix><generation> in a directory
+    """
+
+    def __init__(self, directory=".", prefix="flappy-checkpoint-"):
+        self.directory = directory
+        self.prefix = prefix
+
+    def path(self, generation):
+        return os.path.join(self.directory, "{}{}".format(self.prefix, generation))
+
+    def generations(self):
+        """
+        generations with a checkpoint file, newest first
+        :return: list of int
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        pattern = re.compile(re.escape(self.prefix) + r"(\d+)$")
+        found = [pattern.match(name) for name in os.listdir(self.directory)]
+        return sorted((int(match.group(1)) for match in found if match), reverse=True)
+
+    def load_chain(self, generation):
+        """
+        reads a checkpoint and the checkpoints its deltas build on, newest first
+        :return: list of (generation, Unpacker positioned after the name table)
+        """
+        chain = []
+        while True:
+            kind, stored, base, body = read_header(self.path(generation))
+            if stored != generation:
+                raise ValueError("{} holds generation {}".format(self.path(generation), stored))
+            chain.append((generation, Unpacker(zlib.decompress(body))))
+            if kind == FULL:
+                return chain
+            if base >= generation:
+                raise ValueError("{} has base generation {}".format(self.path(generation), base))
+            generation = base
+
+    def restore(self, config, generation):
+        """
+        rebuilds the population saved at the end of a generation
+        :param config: neat config the run used
+        :param generation: int
+        :return: neat.Population, ready to run the generation after
+        """
+        chain = self.load_chain(generation)
+        genomes = {} # key -> genome, from the oldest checkpoint of the chain to the newest
+        for _, unpacker in reversed(chain):
+            state = read_state(unpacker, config, genomes)
+        next_genome, next_species, next_node, random_state, keys, fitness, species = state
+
+        population = {}
+        for key, value in zip(keys, fitness):
+            if key not in genomes:
+                raise ValueError("genome {} of generation {} is in none of its checkpoints".format(key, generation))
+            population[key] = genomes[key]
+            population[key].fitness = fitness_or_none(value)
+
+        species_set = config.species_set_type(config.species_set_config, neat.reporting.ReporterSet())
+        for key, created, last_improved, representative, members, fitness, adjusted, history in species:
+            s = neat.species.Species(key, created)
+            s.last_improved = last_improved
+            s.update(population[representative], {member: population[member] for member in members})
+            s.fitness, s.adjusted_fitness, s.fitness_history = fitness_or_none(fitness), fitness_or_none(adjusted), history
+            species_set.species[key] = s
+            for member in members:
+                species_set.genome_to_species[member] = key
+        species_set.indexer = count(next_species)
+
+        p = neat.Population(config, (population, species_set, generation + 1))
+        species_set.reporters = p.reporters # reports go to the reporters added to the population
+        p.reproduction.genome_indexer = count(next_genome)
+        config.genome_config.node_indexer = count(next_node) if next_node >= 0 else None
+        random.setstate(random_state)
+        return p
+
+    def restore_latest(self, config):
+        """
+        rebuilds the population from the newest checkpoint that can be read,
+        skipping (and naming) any that are damaged or incomplete
+        :param config: neat config the run used
+        :return: neat.Population, None without a usable checkpoint
+        """
+        for generation in self.generations():
+            start = time.perf_counter()
+            try:
+                p = self.restore(config, generation)
+            except (OSError, ValueError, KeyError, struct.error, zlib.error) as e:
+                print("Skipping checkpoint {}: {}".format(self.path(generation), e))
+                continue
+            print("Resumed from {} in {:.1f} ms".format(self.path(generation), (time.perf_counter() - start) * 1000))
+            return p
+        return None
+
+
+def read_state(unpacker, config, genomes):
+    """
+    reads a body written by snapshot, adding the genomes it stores to genomes
+    :return: (next genome key, next species key, next node key, random state, population keys,
+              their fitness, species as (key, created, last improved, representative, members,
+              fitness, adjusted fitness, fitness history))
+    """
+    next_genome, next_species, next_node = unpacker.unpack("IIq")
+    version = unpacker.unpack("B")[0]
+    state = tuple(unpacker.array("I"))
+    has_gauss, gauss = unpacker.unpack("?d")
+    random_state = (version, state, gauss if has_gauss else None)
+
+    keys = unpacker.array("I")
+    fitness = unpacker.array("d")
+    for _ in range(unpacker.unpack("I")[0]):
+        genome = unpack_genome(unpacker, config.genome_config, config.genome_type)
+        genomes[genome.key] = genome
+
+    species = []
+    for _ in range(unpacker.unpack("I")[0]):
+        key, created, last_improved, representative, s_fitness, adjusted = unpacker.unpack("IIIIdd")
+        history = unpacker.array("d")
+        members = unpacker.array("I")
+        species.append((key, created, last_improved, representative, members, s_fitness, adjusted, history))
+    return next_genome, next_species, next_node, random_state, keys, fitness, species
+
+
+class BackgroundWriter:
+    """
+    Runs writes on a thread of its own, one at a time and in the order they
+    were handed over, so the training loop never waits for the disk. A write
+    that fails is reported and the ones after it still run; wait raises the
+    first failure.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue() # callables still to run
+        self.thread = None # started with the first write
+        self.error = None # first exception a write raised, not raised by wait yet
+
+    def write(self, work):
+        """
+        runs work() on the writer thread, after the work handed over before it
+        :param work: callable doing the write
+        :return: None
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.loop, name="background-writer", daemon=True)
+            self.thread.start()
+        self.queue.put(work)
+
+    def loop(self):
+        while True:
+            work = self.queue.get()
+            try:
+                work()
+            except Exception as e: # a failed write must not stop the thread, or wait would never return
+                print("Background write failed: {!r}".format(e))
+                if self.error is None:
+                    self.error = e
+            finally:
+                self.queue.task_done()
+
+    def wait(self):
+        """
+        blocks until everything handed over so far is written
+        :return: None, and raises the first exception a write raised since the last wait
+        """
+        self.queue.join()
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+
+def write_file(path, data, writer=None):
+    """
+    writes bytes to a file atomically: a crash leaves the old file or the new one
+    :param path: file name, relative to the working directory at the time of the call
+    :param data: bytes, not changed afterwards
+    :param writer: BackgroundWriter, None to write before returning
+    :return: None
+    """
+    path = os.path.abspath(path) # the working directory may change before the writer gets to it
+    def work():
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, path)
+    if writer is None:
+        work()
+    else:
+        writer.write(work)
+
+
+class CheckpointReporter(neat.reporting.BaseReporter):
+    """
+    Saves a checkpoint every generation_interval generations, in the background
+    """
+
+    def __init__(self, population, generation_interval=5, full_interval=2, store=None, writer=None):
+        """
+        :param population: the neat.Population being run, for its genome key counter
+        :param generation_interval: generations between two checkpoints (int)
+        :param full_interval: every full_interval-th checkpoint is full, the others are deltas (int)
+        :param store: CheckpointStore, checkpoints in the working directory by default
+        :param writer: BackgroundWriter, a new one by default
+        :return: None
+        """
+        self.population = population
+        self.generation_interval = generation_interval
+        self.full_interval = full_interval
+        self.store = store or CheckpointStore()
+        self.writer = writer or BackgroundWriter()
+        self.current_generation = None
+        self.last_generation = population.generation - 1 # generation of the last checkpoint
+        self.since_full = None # deltas written since the last full checkpoint, None before the first one
+        self.base = None # (generation, genome keys) of the last checkpoint
+
+    def start_generation(self, generation):
+        self.current_generation = generation
+
+    def end_generation(self, config, population, species_set):
+        if self.current_generation - self.last_generation < self.generation_interval:
+            return
+        self.last_generation = self.current_generation
+
+        full = self.since_full is None or self.since_full + 1 >= self.full_interval
+        base = None if full else self.base
+        start = time.perf_counter()
+        body = snapshot(config, population, species_set, self.population.reproduction, None if full else base[1])
+        blocked = time.perf_counter() - start
+        self.since_full = 0 if full else self.since_full + 1
+        self.base = (self.current_generation, set(population))
+
+        generation = self.current_generation
+        path = self.store.path(generation)
+        target = os.path.abspath(path) # the working directory may change before the writer gets to it
+
+        def work():
+            start = time.perf_counter()
+            size = write_checkpoint(target, body, FULL if full else DELTA, generation, NO_BASE if full else base[0])
+            print("Checkpoint {} ({}{}): {} bytes, snapshot {:.1f} ms, written in the background in {:.1f} ms".format(
+                path, "full" if full else "delta on ", "" if full else base[0], size, blocked * 1000,
+                (time.perf_counter() - start) * 1000))
+        self.writer.write(work)
+
+
+def pack_network(net):
+    """
+    a FeedForwardNetwork as bytes, with functions stored by name
+    :param net: neat.nn.FeedForwardNetwork
+    :return: bytes
+    """
+    packer = Packer()
+    packer.array("i", list(net.input_nodes))
+    packer.array("i", list(net.output_nodes))
+    packer.pack("I", len(net.node_evals))
+    for node, act_func, agg_func, bias, response, links in net.node_evals:
+        packer.pack("iHHdd", node, packer.name(act_func.__name__.replace("_activation", "")),
+                    packer.name(agg_func.__name__.replace("_aggregation", "")), bias, response)
+        packer.array("i", [i for i, _ in links])
+        packer.array("d", [w for _, w in links])
+    body = zlib.compress(packer.body())
+    return NETWORK_HEADER.pack(NETWORK_MAGIC, VERSION, len(body), zlib.crc32(body)) + body
+
+
+def unpack_network(data):
+    """
+    reads bytes written by pack_network, without building any functions
+    :param data: bytes
+    :return: (input keys, output keys, node_evals with activation and aggregation names instead of functions)
+    """
+    if len(data) < NETWORK_HEADER.size:
+        raise ValueError("too short for a network")
+    magic, version, size, crc = NETWORK_HEADER.unpack_from(data)
+    if magic != NETWORK_MAGIC:
+        raise ValueError("not a network file")
+    if version > VERSION:
+        raise ValueError("network version {}, this reader only knows up to {}".format(version, VERSION))
+    body = data[NETWORK_HEADER.size:]
+    if len(body) != size or zlib.crc32(body) != crc:
+        raise ValueError("network file is damaged (size or checksum mismatch)")
+
+    unpacker = Unpacker(zlib.decompress(body))
+    inputs = unpacker.array("i")
+    outputs = unpacker.array("i")
+    node_evals = []
+    for _ in range(unpacker.unpack("I")[0]):
+        node, activation, aggregation, bias, response = unpacker.unpack("iHHdd")
+        sources = unpacker.array("i")
+        weights = unpacker.array("d")
+        node_evals.append((node, unpacker.names[activation], unpacker.names[aggregation], bias, response, list(zip(sources, weights))))
+    return inputs, outputs, node_evals
+
+
+def build_network(inputs, outputs, node_evals):
+    """
+    a FeedForwardNetwork from node_evals with function names, as unpack_network gives them
+    :return: neat.nn.FeedForwardNetwork
+    """
+    activations = neat.activations.ActivationFunctionSet()
+    aggregations = neat.aggregations.AggregationFunctionSet()
+    return neat.nn.FeedForwardNetwork(inputs, outputs, [(node, activations.get(act), aggregations.get(agg), bias, response, links)
+                                                       for node, act, agg, bias, response, links in node_evals])
+
+
+def load_network(data):
+    """
+    a FeedForwardNetwork from bytes written by pack_network
+    :param data: bytes
+    :return: neat.nn.FeedForwardNetwork
+    """
+    return build_network(*unpack_network(data))
+
+
+def save_network(path, net, writer=None):
+    """
+    writes a network to a file, on writer's thread if one is given
+    :param path: file name
+    :param net: neat.nn.FeedForwardNetwork
+    :param writer: BackgroundWriter, None to write before returning
+    :return: None
+    """
+    write_file(path, pack_network(net), writer) # packed now, the network is not touched afterwards
@@ -0,0 +1,159 @@
+"""
+Bird and pipe collision.
+
+Overlapping bitmasks is exact but is the most expensive way to find out that a
+bird is nowhere near a pipe, which is what most checks find. collide_pipe()
+tries cheaper tests first:
+
+1. box reject: the bird's and the pipe's rectangles don't overlap horizontally
+2. gap test: the bird's rectangle is inside the gap between pipe.height and pipe.bottom
+3. mask overlap, only for the top or bottom pipe whose rectangle the bird's touches
+
+A mask can only overlap where the rectangles do, so the answer is always the
+same as overlapping the masks straight away. With geometric=True the third step
+is skipped and touching rectangles count as a hit, which is cheaper still but
+harsher than pixel perfect, since the corners of the bird sprite are empty.
+
+Running this file benchmarks the layers over the pipe positions of a game.
+"""
+import pygame #masks
+from profiler import profiler #counting mask builds
+
+
+mask_cache = {} #collision masks, built once per sprite and rotation angle
+
+
+def get_mask(image, angle=0):
+    """
+    gets the collision mask of an image, building it only the first time it is asked for
+    :param image: pygame Surface (sprites are shared, so the surface itself is the key)
+    :param angle: rotation in degrees, 0 for the unrotated image
+    :return: pygame Mask
+    """
+    key = (image, angle)
+    mask = mask_cache.get(key)
+    if mask is None:
+        if angle:
+            mask = pygame.mask.from_surface(pygame.transform.rotate(image, angle))
+        else:
+            mask = pygame.mask.from_surface(image)
+        mask_cache[key] = mask
+        profiler.count("mask builds")
+    return mask
+
+
+class CollisionStats:
+    """
+    Counts how collide_pipe() got its answers
+    """
+
+    def __init__(self):
+        self.checks = 0 # calls to collide_pipe
+        self.box_rejects = 0 # answered by the horizontal box test
+        self.gap_clears = 0 # answered by the gap test
+        self.mask_tests = 0 # mask overlaps done
+
+    def reset(self):
+        self.__init__()
+
+    def __repr__(self):
+        return "CollisionStats(checks={}, box_rejects={}, gap_clears={}, mask_tests={})".format(
+            self.checks, self.box_rejects, self.gap_clears, self.mask_tests)
+
+
+stats = CollisionStats() # counters of every collide_pipe call
+
+
+def collide_pipe(bird, x, height, top, bottom, top_image, bottom_image, geometric=False):
+    """
+    checks if a bird touches a pipe, same answer as overlapping their masks
+    :param bird: Bird object
+    :param x: left of the pipe (int)
+    :param height: bottom of the top pipe (int)
+    :param top: where the top pipe image is drawn (int)
+    :param bottom: top of the bottom pipe (int)
+    :param top_image: pygame Surface of the top pipe
+    :param bottom_image: pygame Surface of the bottom pipe
+    :param geometric: count touching rectangles as a hit instead of testing masks
+    :return: Bool
+    """
+    stats.checks += 1
+    width, bird_height = bird.img.get_size()
+    pipe_width = top_image.get_width()
+
+    # 1. box reject: no horizontal overlap with the pipe
+    if x >= bird.x + width or x + pipe_width <= bird.x:
+        stats.box_rejects += 1
+        return False
+
+    # 2. gap test: which of the top pipe [top, height) and bottom pipe [bottom, ...) rectangles the bird's touches
+    y = round(bird.y) # masks are placed at whole pixels
+    hits_top = y < height and y + bird_height > top
+    hits_bottom = y + bird_height > bottom and y < bottom + bottom_image.get_height()
+    if not (hits_top or hits_bottom):
+        stats.gap_clears += 1
+        return False
+    if geometric:
+        return True
+
+    # 3. pixel perfect test, only against the pipe whose rectangle is touched
+    bird_mask = bird.get_mask()
+    if hits_top:
+        stats.mask_tests += 1
+        if bird_mask.overlap(get_mask(top_image), (x - bird.x, top - y)):
+            return True
+    if hits_bottom:
+        stats.mask_tests += 1
+        if bird_mask.overlap(get_mask(bottom_image), (x - bird.x, bottom - y)):
+            return True
+    return False
+
+
+if __name__ == "__main__":
+    import os #image paths
+    import random #bird and pipe positions
+    import time #timing
+
+    class Sprite:
+        """
+        just enough of a Bird or Pipe for collide
+        """
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    pipe_img = pygame.transform.scale2x(pygame.image.load(os.path.join(here, "imgs", "pipe.png")))
+    bird_img = pygame.transform.scale2x(pygame.image.load(os.path.join(here, "imgs", "bird1.png")))
+
+    rng = random.Random(0)
+    cases = []
+    for _ in range(200):
+        pipe = Sprite()
+        pipe.PIPE_TOP = pygame.transform.flip(pipe_img, False, True)
+        pipe.PIPE_BOTTOM = pipe_img
+        pipe.height = rng.randrange(50, 450)
+        pipe.top = pipe.height - pipe_img.get_height()
+        pipe.bottom = pipe.height + 200
+        for x in range(700, -pipe_img.get_width(), -5): # every position of a pipe crossing the screen
+            bird = Sprite()
+            bird.x, bird.y, bird.img = 230, rng.uniform(pipe.height - 60, pipe.bottom + 10), bird_img
+            bird.get_mask = lambda: get_mask(bird_img)
+            pipe_at = Sprite()
+            pipe_at.__dict__.update(pipe.__dict__, x=x)
+            cases.append((bird, pipe_at))
+
+    start = time.perf_counter()
+    full = [bool(bird.get_mask().overlap(get_mask(pipe.PIPE_TOP), (pipe.x - bird.x, pipe.top - round(bird.y))) or
+                 bird.get_mask().overlap(get_mask(pipe.PIPE_BOTTOM), (pipe.x - bird.x, pipe.bottom - round(bird.y))))
+            for bird, pipe in cases]
+    full_time = time.perf_counter() - start
+
+    stats.reset()
+    start = time.perf_counter()
+    layered = [collide_pipe(bird, pipe.x, pipe.height, pipe.top, pipe.bottom, pipe.PIPE_TOP, pipe.PIPE_BOTTOM)
+               for bird, pipe in cases]
+    layered_time = time.perf_counter() - start
+
+    assert layered == full, "layered collision disagrees with mask overlap"
+    print("{} checks, {} hits".format(len(cases), sum(full)))
+    print("mask overlap only: {} mask tests, {:.1f} ms".format(2 * len(cases), full_time * 1000))
+    print("layered:           {} mask tests, {:.1f} ms ({} box rejects, {} gap clears, {:.1%} of mask tests avoided)".format(
+        stats.mask_tests, layered_time * 1000, stats.box_rejects, stats.gap_clears, 1 - stats.mask_tests / (2 * len(cases))))
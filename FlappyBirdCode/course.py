@@ -0,0 +1,63 @@
+"""
+Seeded pipe courses for NEAT training.
+
+PipeRing.spawn draws every pipe height from the global random module, so two
+games never see the same pipes and a bird's fitness depends on luck. A Course
+works out the sequence of pipe heights from a seed instead, so any game, in any
+process, can replay exactly the same pipes.
+"""
+import random #seeded generator for the pipe heights
+import numpy as np #pipe heights kept as an array
+
+
+class Course:
+    """
+    The heights of the pipes of one game, in the order they appear
+    """
+
+    LENGTH = 32 # pipes worked out up front, a game stops once the score gets past 21
+
+    def __init__(self, seed):
+        """
+        generating the course
+        :param seed: int, the same seed always gives the same pipes
+        :return: None
+        """
+        self.seed = seed
+        self.rng = random.Random(seed) # same draws as random.seed(seed) followed by PipeRing.spawn
+        self.heights = np.array([self.rng.randrange(50, 450) for _ in range(self.LENGTH)])
+
+    def height(self, index):
+        """
+        height of a pipe
+        :param index: 0 for the first pipe of the game, 1 for the next and so on
+        :return: int
+        """
+        while index >= len(self.heights): # longer games keep drawing from the same generator
+            self.heights = np.append(self.heights, self.rng.randrange(50, 450))
+        return int(self.heights[index])
+
+    def __eq__(self, other):
+        """
+        two courses are the same when they come from the same seed
+        :param other: Course
+        :return: bool
+        """
+        return isinstance(other, Course) and self.seed == other.seed
+
+    def __hash__(self):
+        return hash(self.seed)
+
+    def __repr__(self):
+        return "Course({})".format(self.seed)
+
+
+def make_courses(count, seed=None):
+    """
+    courses for one generation
+    :param count: number of courses every genome plays (int)
+    :param seed: int to get the same courses every time, None for new random courses
+    :return: list of Course
+    """
+    rng = random.Random(seed) if seed is not None else random
+    return [Course(rng.randrange(2**32)) for _ in range(count)]
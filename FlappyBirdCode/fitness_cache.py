@@ -0,0 +1,102 @@
+"""
+Fitness memoization for NEAT training.
+
+Elitism carries unchanged genomes into the next generation, and a genome's
+fitness only depends on its network and the pipe courses it plays. When the
+courses are the same every generation (a fixed --seed) those genomes don't need
+to be played again: their fitness is looked up by a hash of the network
+(enabled connections, weights, biases, responses and activations, in
+evaluation order) and the course seeds.
+"""
+import hashlib #hashing networks
+from collections import OrderedDict #least recently used order
+
+import neat #reporter base class
+
+
+def network_key(net, courses):
+    """
+    canonical key of a network playing some courses
+    :param net: neat.nn.FeedForwardNetwork
+    :param courses: list of Course
+    :return: str
+    """
+    nodes = tuple((node, act_func.__name__, agg_func.__name__, bias, response, tuple(links))
+                  for node, act_func, agg_func, bias, response, links in net.node_evals)
+    description = (tuple(net.input_nodes), tuple(net.output_nodes), nodes, tuple(course.seed for course in courses))
+    return hashlib.sha1(repr(description).encode()).hexdigest() # repr keeps every digit of the floats
+
+
+class FitnessCache:
+    """
+    Fitness of recently played networks, with least recently used eviction
+    """
+
+    def __init__(self, max_size=10000):
+        """
+        creating an empty cache
+        :param max_size: number of fitness values kept (int)
+        :return: None
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict() # key -> fitness, oldest first
+        self.hits = 0 # lookups that found a fitness
+        self.misses = 0 # lookups that did not
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        looking up a fitness
+        :param key: from network_key
+        :return: float, None if not cached
+        """
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key) # recently used
+        return fitness
+
+    def put(self, key, fitness):
+        """
+        remembering a fitness
+        :param key: from network_key
+        :param fitness: float
+        :return: None
+        """
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False) # drop the least recently used
+
+
+class FitnessCacheReporter(neat.reporting.BaseReporter):
+    """
+    Reports the fitness cache hits and misses of every generation, next to the other neat reporters
+    """
+
+    def __init__(self, cache):
+        """
+        :param cache: FitnessCache used by the evaluation
+        :return: None
+        """
+        self.cache = cache
+        self.generation_hits = [] # hits of each generation
+        self.generation_misses = [] # misses of each generation
+        self.hits = 0 # counters at the start of the generation
+        self.misses = 0
+
+    def start_generation(self, generation):
+        self.hits = self.cache.hits
+        self.misses = self.cache.misses
+
+    def end_generation(self, config, population, species_set):
+        hits = self.cache.hits - self.hits
+        misses = self.cache.misses - self.misses
+        self.generation_hits.append(hits)
+        self.generation_misses.append(misses)
+        print("Fitness cache: {} hits, {} misses ({:.0%} hit rate), {} entries".format(
+            hits, misses, hits / max(hits + misses, 1), len(self.cache)))
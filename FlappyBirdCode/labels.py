@@ -0,0 +1,44 @@
+"""
+Cached text labels.
+
+Rendering text with a font rasterizes every glyph again, and the score, gens
+and alive labels were rendered every frame although their text only changes
+a few times per game. A LabelCache keeps the rendered surface of every text
+it has seen, so a label is only rendered when its value changes to one that
+has not been shown before.
+"""
+from profiler import profiler #counting text renders
+
+
+class LabelCache:
+    """
+    Rendered labels of one font and color, by text
+    """
+
+    MAX_SIZE = 256 # labels kept, a generation with thousands of birds goes through many alive counts
+
+    def __init__(self, font, color, antialias=True):
+        """
+        :param font: pygame Font
+        :param color: text color (r, g, b)
+        :param antialias: bool
+        :return: None
+        """
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+        self.labels = {} # text -> pygame Surface
+
+    def render(self, text):
+        """
+        the rendered label of a text, rendered only the first time it is asked for
+        :param text: str
+        :return: pygame Surface
+        """
+        label = self.labels.get(text)
+        if label is None:
+            if len(self.labels) >= self.MAX_SIZE:
+                self.labels.clear()
+            label = self.labels[text] = self.font.render(text, self.antialias, self.color)
+            profiler.count("text renders")
+        return label
@@ -0,0 +1,201 @@
+"""
+Input latency tracing for the human game.
+
+Every space press is timestamped when it is read from the event queue (or,
+when replaying, at the time the script pressed it). The press makes the bird
+jump on the next physics tick, and the press counts as shown once a frame
+drawn after that tick has been pushed with pygame.display.update; the time
+from the press to then is its input-to-photon latency. The time between two
+shown frames gives the frame time and its jitter.
+
+On with FLAPPY_LATENCY=1. FLAPPY_REPLAY=script.json replays a scripted game
+without a window or sound, with the tracer on:
+
+    {"seed": 0, "presses": [0, 350, 700, 1050]}
+
+seed seeds the pipes, presses are the times of the space presses in
+milliseconds from the start of the replay. Half a second after the last press
+the game quits. The summary is printed at the end of every game. If
+FLAPPY_LATENCY_OUT is set, the file is written again after every game with the
+summary over every game so far, and each game's own summary in "games", so loop
+changes can be compared by script and a restart keeps the earlier games.
+"""
+import os #FLAPPY_LATENCY switch
+import math #nearest rank
+import json #replay scripts and results
+import time #timestamps
+import pygame #posting replayed events
+
+
+def percentile(values, fraction):
+    """
+    nearest rank percentile
+    :param values: sorted list of numbers
+    :param fraction: 0.5 for the median, 0.95 for the 95th percentile...
+    :return: float, None without values
+    """
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)] # the smallest value with at least that fraction at or below it
+
+
+class LatencyTracer:
+    """
+    Input-to-photon latencies and frame times of a game
+    """
+
+    def __init__(self, enabled=False):
+        """
+        :param enabled: record anything at all (bool)
+        :return: None
+        """
+        self.enabled = enabled
+        self.games = [] # summary of every game reported so far
+        self.all_latencies = [] # latencies of every game reported so far
+        self.all_frame_times = [] # frame times of every game reported so far
+        self.all_frames = 0 # frames shown in every game reported so far
+        self.reset()
+
+    def reset(self):
+        """
+        forgets everything recorded in this game
+        :return: None
+        """
+        self.waiting = [] # press times not applied by a tick yet
+        self.applied = [] # press times applied, not shown yet
+        self.latencies = [] # seconds from press to shown frame
+        self.frame_times = [] # seconds between shown frames
+        self.last_frame = None
+
+    def input(self, stamp=None):
+        """
+        a space press was read
+        :param stamp: perf_counter time of the press, None for now
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self.waiting.append(time.perf_counter() if stamp is None else stamp)
+
+    def tick(self):
+        """
+        a physics tick ran, the presses read so far have taken effect
+        :return: None
+        """
+        if not self.enabled or not self.waiting:
+            return
+        self.applied.extend(self.waiting)
+        self.waiting.clear()
+
+    def frame(self):
+        """
+        a frame was pushed to the display
+        :return: None
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_times.append(now - self.last_frame)
+        self.last_frame = now
+        for stamp in self.applied:
+            self.latencies.append(now - stamp)
+        self.applied.clear()
+
+    def summary(self, latencies=None, frame_times=None, frames=None):
+        """
+        percentiles of the latency and the frame time, in milliseconds
+        :param latencies: seconds, None for those of this game
+        :param frame_times: seconds, None for those of this game
+        :param frames: frames shown, None for those of this game
+        :return: dict
+        """
+        if latencies is None:
+            latencies, frame_times = self.latencies, self.frame_times
+            frames = len(self.frame_times) + (self.last_frame is not None)
+        latencies = sorted(latencies)
+        frame_times = sorted(frame_times)
+        mean = sum(frame_times) / len(frame_times) if frame_times else 0
+        jitter = (sum((t - mean) ** 2 for t in frame_times) / len(frame_times)) ** 0.5 if frame_times else 0
+        ms = lambda value: None if value is None else value * 1000
+        return {"presses": len(latencies),
+                "latency_p50_ms": ms(percentile(latencies, 0.5)),
+                "latency_p95_ms": ms(percentile(latencies, 0.95)),
+                "latency_p99_ms": ms(percentile(latencies, 0.99)),
+                "frames": frames,
+                "frame_p50_ms": ms(percentile(frame_times, 0.5)),
+                "frame_p95_ms": ms(percentile(frame_times, 0.95)),
+                "frame_p99_ms": ms(percentile(frame_times, 0.99)),
+                "frame_jitter_ms": jitter * 1000}
+
+    def report(self, title="Input latency"):
+        """
+        prints the summary of this game, writes every game so far to FLAPPY_LATENCY_OUT
+        and starts a new game
+        :param title: first word of the line
+        :return: None
+        """
+        if not self.enabled:
+            return
+        summary = self.summary()
+        fmt = lambda value: "-" if value is None else "{:.1f}".format(value)
+        print("{}: {} presses, p50 {} ms, p95 {} ms, p99 {} ms; frame time p50 {} ms, p95 {} ms, p99 {} ms, jitter {} ms".format(
+            title, summary["presses"], fmt(summary["latency_p50_ms"]), fmt(summary["latency_p95_ms"]), fmt(summary["latency_p99_ms"]),
+            fmt(summary["frame_p50_ms"]), fmt(summary["frame_p95_ms"]), fmt(summary["frame_p99_ms"]), fmt(summary["frame_jitter_ms"])))
+        summary["game"] = len(self.games) + 1
+        self.games.append(summary)
+        self.all_latencies.extend(self.latencies)
+        self.all_frame_times.extend(self.frame_times)
+        self.all_frames += summary["frames"]
+        out = os.environ.get("FLAPPY_LATENCY_OUT")
+        if out:
+            total = self.summary(self.all_latencies, self.all_frame_times, self.all_frames) # frame times between games are left out
+            total["games"] = self.games
+            with open(out, "w") as f:
+                json.dump(total, f, indent=2)
+        self.reset()
+
+
+class Replay:
+    """
+    Posts the space presses of a script to the event queue when they are due
+    """
+
+    QUIT_AFTER = 0.5 # seconds between the last press and quitting, so it gets shown
+
+    def __init__(self, path):
+        """
+        loading a script
+        :param path: json file with "seed" and "presses" (milliseconds from the start)
+        :return: None
+        """
+        with open(path) as f:
+            script = json.load(f)
+        self.seed = script.get("seed", 0)
+        self.presses = sorted(script["presses"]) or [0]
+        self.next = 0 # index of the next press
+        self.start = None # perf_counter time of the first poll
+
+    @property
+    def done(self):
+        return self.next >= len(self.presses)
+
+    def post(self):
+        """
+        posts the presses that are due, then a quit once every press has been shown.
+        Called right before the event queue is read.
+        :return: None
+        """
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        while not self.done and self.start + self.presses[self.next] / 1000 <= now:
+            stamp = self.start + self.presses[self.next] / 1000 # when the script pressed, the wait for the poll is part of the latency
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, stamp=stamp))
+            self.next += 1
+        if self.done and now >= self.start + self.presses[-1] / 1000 + self.QUIT_AFTER:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+
+REPLAY = os.environ.get("FLAPPY_REPLAY") # script to replay, None to play for real
+tracer = LatencyTracer(os.environ.get("FLAPPY_LATENCY") == "1" or bool(REPLAY)) # shared by the game loop
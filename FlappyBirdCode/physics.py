@@ -0,0 +1,116 @@
+"""
+Precomputed bird physics.
+
+Between two jumps a bird's path only depends on how many ticks ago it jumped
+(or, before its first jump, how many ticks ago it started falling). Bird.move
+works the displacement out every frame from vel*t + 1.5*t**2, caps it at the
+terminal velocity and adds the -2 jump boost; here that is done once for every
+tick, together with the tilt, so moving a bird is a table lookup.
+
+After LENGTH ticks the bird is falling at terminal velocity and fully nose
+down, so every later tick looks like the last entry of the tables.
+"""
+import numpy as np #tables for the vectorized population
+
+
+JUMP_VEL = -10.5 # velocity given by Bird.jump
+MAX_ROTATION = 25 # same as Bird.MAX_ROTATION
+ROT_VEL = 20 # same as Bird.ROT_VEL
+TERMINAL = 16 # largest downward displacement per tick
+LENGTH = 32 # ticks worked out
+
+FALLING = 0 # table row for a bird that has not jumped yet (vel 0)
+JUMPED = 1 # table row for a bird that has jumped (vel JUMP_VEL)
+
+
+def step_displacement(vel, tick):
+    """
+    displacement of one tick, the way Bird.move has always worked it out
+    :param vel: velocity at the last jump (0 or JUMP_VEL)
+    :param tick: ticks since the last jump, counting this one (int)
+    :return: float
+    """
+    displacement = vel*(tick) + 0.5*(3)*(tick)**2 # downward acceleration
+
+    if displacement >= TERMINAL: # terminal velocity
+        displacement = (displacement/abs(displacement)) * TERMINAL
+
+    if displacement < 0: # jump height
+        displacement -= 2
+    return displacement
+
+
+def build_tables():
+    """
+    works out displacement and tilt for every tick
+    :return: (displacement, tilt) lists, each [FALLING row, JUMPED row], indexed by tick
+    """
+    displacement = []
+    tilt = []
+    for vel in (0, JUMP_VEL):
+        d_row = [0.0] # nothing happens at tick 0
+        t_row = [0] # tick 0 keeps whatever tilt the bird had, never looked up
+        y = 0.0 # position relative to where the bird jumped from
+        angle = MAX_ROTATION # the first tick always tilts up, whatever the tilt was
+        for tick in range(1, LENGTH):
+            d = step_displacement(vel, tick)
+            y += d
+            if d < 0 or y < 50: # moving up or still close to the jump: tilt up
+                angle = max(angle, MAX_ROTATION)
+            elif angle > -90: # falling: nose dive
+                angle -= ROT_VEL
+            d_row.append(d)
+            t_row.append(angle)
+        displacement.append(d_row)
+        tilt.append(t_row)
+
+    for row in range(2): # the last tick must repeat forever for lookups past LENGTH
+        assert displacement[row][-1] == TERMINAL and tilt[row][-1] == tilt[row][-2]
+    return displacement, tilt
+
+
+DISPLACEMENT, TILT = build_tables()
+
+# numpy copies for the vectorized population
+DISPLACEMENT_TABLE = np.array(DISPLACEMENT)
+TILT_TABLE = np.array(TILT, dtype=np.int64)
+
+
+def kind(vel):
+    """
+    table row for a velocity
+    :param vel: velocity at the last jump (0 or JUMP_VEL)
+    :return: FALLING or JUMPED
+    """
+    return JUMPED if vel else FALLING
+
+
+def lookup(vel, tick):
+    """
+    displacement and tilt of one tick, same result as Bird.move
+    :param vel: velocity at the last jump (0 or JUMP_VEL)
+    :param tick: ticks since the last jump, counting this one (int, >= 1)
+    :return: (displacement, tilt after the tick)
+    """
+    row = kind(vel)
+    tick = min(tick, LENGTH - 1)
+    return DISPLACEMENT[row][tick], TILT[row][tick]
+
+
+def advance(y, vel, tick, ticks):
+    """
+    skips ahead: where a bird is after some more ticks without jumping
+    (its tilt is then lookup(vel, tick + ticks)[1])
+    :param y: current y pos
+    :param vel: velocity at the last jump (0 or JUMP_VEL)
+    :param tick: ticks since the last jump so far (int)
+    :param ticks: how many ticks to skip (int)
+    :return: new y pos
+    """
+    row = kind(vel)
+    for t in range(tick + 1, min(tick + ticks, LENGTH - 1) + 1): # same additions as moving tick by tick
+        y += DISPLACEMENT[row][t]
+    terminal = tick + ticks - max(tick, LENGTH - 1) # ticks past the table, all at terminal velocity
+    if terminal > 0:
+        y += TERMINAL * terminal # displacements are multiples of 0.5, so this adds up exactly
+    return y
@@ -0,0 +1,163 @@
+"""
+The pipes of a game, in a ring buffer.
+
+The game loops kept a list of Pipe objects: every frame they built a list of
+pipes to remove, called pipes.remove for each of them, appended new pipes and
+worked out again which pipe the birds should look at. Pipes always appear on
+the right and leave on the left, in the order they were spawned, so they fit
+a fixed size ring: x, height, top and bottom are kept in one array
+each, a new pipe goes in after the newest one and culling a pipe only moves
+the start of the ring.
+
+Pipes are numbered in the order they were spawned (their sequence number);
+pipe n lives in slot n % capacity of the arrays. Cursors into that sequence
+remember the oldest pipe on screen, the first pipe not passed yet and the pipe
+ahead of the birds, so each of them only ever moves forward.
+"""
+import random #random pipe heights
+import numpy as np #pipe arrays
+from collision import collide_pipe #pixel perfect collision of a single bird
+
+
+class PipeRing:
+    """
+    Every pipe on screen, as arrays indexed by slot
+    """
+
+    CAPACITY = 8 # pipes on screen at once, a game never has more than 3
+
+    def __init__(self, top_image, bottom_image, gap=200, capacity=CAPACITY):
+        """
+        an empty ring
+        :param top_image: pygame Surface of the top pipe
+        :param bottom_image: pygame Surface of the bottom pipe
+        :param gap: space between the top and bottom pipe (int)
+        :param capacity: most pipes on screen at once (int)
+        :return: None
+        """
+        self.top_image = top_image
+        self.bottom_image = bottom_image
+        self.width = top_image.get_width() # a pipe is culled once it is this far left of the screen
+        self.gap = gap
+        self.capacity = capacity
+
+        self.x = np.zeros(capacity, dtype=np.int64) # left of each pipe
+        self.height = np.zeros(capacity, dtype=np.int64) # bottom of the top pipe
+        self.top = np.zeros(capacity, dtype=np.int64) # where the top pipe image is drawn
+        self.bottom = np.zeros(capacity, dtype=np.int64) # top of the bottom pipe
+        self.reset()
+
+    def reset(self):
+        """
+        removes every pipe
+        :return: None
+        """
+        self.first = 0 # sequence number of the oldest pipe on screen
+        self.end = 0 # sequence number of the next pipe spawned
+        self.unpassed = 0 # sequence number of the first pipe not passed yet
+        self.ahead = 0 # sequence number of the pipe ahead of the birds
+
+    def __len__(self):
+        """
+        number of pipes on screen
+        :return: int
+        """
+        return self.end - self.first
+
+    def __iter__(self):
+        """
+        slots of the pipes on screen, oldest (leftmost) first
+        :return: iterator of int
+        """
+        for n in range(self.first, self.end):
+            yield n % self.capacity
+
+    def spawn(self, x, height=None):
+        """
+        adds a pipe after the newest one
+        :param x: int
+        :param height: height of the gap from the top of the screen (int), None for a random one
+        :return: slot of the new pipe
+        """
+        if len(self) == self.capacity:
+            raise IndexError("pipe ring is full ({} pipes)".format(self.capacity))
+        if height is None:
+            height = random.randrange(50, 450)
+        slot = self.end % self.capacity
+        self.x[slot] = x
+        self.height[slot] = height
+        self.top[slot] = height - self.top_image.get_height() # the top pipe extends down on to the screen
+        self.bottom[slot] = height + self.gap
+        self.end += 1
+        return slot
+
+    def cull(self):
+        """
+        removes the pipes that have gone off the left of the screen
+        :return: number of pipes removed
+        """
+        culled = 0
+        while self.first < self.end and self.x[self.first % self.capacity] + self.width < 0:
+            self.first += 1
+            culled += 1
+        self.unpassed = max(self.unpassed, self.first)
+        self.ahead = max(self.ahead, self.first)
+        return culled
+
+    def move(self, vel):
+        """
+        moves every pipe to the left
+        :param vel: pixels (int)
+        :return: None
+        """
+        self.x -= vel # free slots move too, spawn sets them again
+
+    def pass_birds(self, bird_x):
+        """
+        counts the pipes the birds have got past since the last call
+        :param bird_x: x pos of the birds (int)
+        :return: number of pipes passed this time
+        """
+        passed = 0
+        while self.unpassed < self.end and self.x[self.unpassed % self.capacity] < bird_x:
+            self.unpassed += 1
+            passed += 1
+        return passed
+
+    def ahead_slot(self, bird_x):
+        """
+        slot of the pipe the birds should look at: the first one whose right
+        edge they have not got past, or the newest pipe if they are past them all
+        :param bird_x: x pos of the birds (int)
+        :return: int, None without pipes
+        """
+        if self.first == self.end:
+            return None
+        while self.ahead < self.end - 1 and bird_x > self.x[self.ahead % self.capacity] + self.width:
+            self.ahead += 1
+        return self.ahead % self.capacity
+
+    def collide(self, slot, bird, geometric=False):
+        """
+        checks if a bird touches a pipe
+        :param slot: int
+        :param bird: Bird object
+        :param geometric: count touching rectangles as a hit instead of testing masks
+        :return: Bool
+        """
+        return collide_pipe(bird, int(self.x[slot]), int(self.height[slot]), int(self.top[slot]), int(self.bottom[slot]),
+                            self.top_image, self.bottom_image, geometric)
+
+    def draw(self, win, shift=0):
+        """
+        draws the top and bottom of every pipe
+        :param win: pygame window/surface
+        :param shift: pixels to the right of the current positions, to draw in between two ticks
+        :return: list of pygame Rects drawn
+        """
+        rects = []
+        for slot in self:
+            x = int(self.x[slot]) + shift
+            rects.append(win.blit(self.top_image, (x, int(self.top[slot]))))
+            rects.append(win.blit(self.bottom_image, (x, int(self.bottom[slot]))))
+        return rects
@@ -0,0 +1,243 @@
+"""
+Vectorized bird population used for NEAT training.
+
+Instead of a list of Bird objects, the whole population is kept as NumPy
+arrays (one array per attribute, one slot per bird) so that moving, animating
+and collision checking every bird is a handful of array operations per frame
+no matter how large pop_size is.
+"""
+import numpy as np #arrays for the whole population
+from physics import DISPLACEMENT_TABLE, TILT_TABLE, LENGTH #precomputed bird physics
+
+
+def mask_to_array(mask):
+    """
+    copies a pygame mask into a boolean array
+    :param mask: pygame Mask
+    :return: numpy bool array indexed [y, x]
+    """
+    width, height = mask.get_size()
+    return np.array([[mask.get_at((x, y)) for x in range(width)] for y in range(height)], dtype=bool)
+
+
+class PipeCollisionTable:
+    """
+    Pixel perfect collision of every bird image against one pipe image, precomputed.
+
+    Bird.get_mask().overlap(pipe_mask, (ox, oy)) only depends on the bird image and
+    the integer offset of the pipe from the bird, so it is worked out once for every
+    offset where the two sprites can touch. Looking up hits[frame, ox, oy] then gives
+    exactly the same answer as the mask overlap, for any number of birds at once.
+    """
+
+    def __init__(self, bird_masks, pipe_mask):
+        """
+        builds the table
+        :param bird_masks: list of pygame Masks, one per bird image
+        :param pipe_mask: pygame Mask of the pipe image
+        :return: None
+        """
+        birds = [mask_to_array(mask) for mask in bird_masks]
+        pipe = mask_to_array(pipe_mask)
+        bird_h, bird_w = birds[0].shape
+        pipe_h, pipe_w = pipe.shape
+
+        # Every opaque column of the pipe must be one solid run of pixels, which holds
+        # for the pipe sprite and lets each bird pixel turn into a single range of oy.
+        runs = [] # (column, first row, last row) of each pipe column
+        for col in range(pipe_w):
+            rows = np.flatnonzero(pipe[:, col])
+            if len(rows) == 0:
+                continue
+            if rows[-1] - rows[0] + 1 != len(rows):
+                raise ValueError("pipe mask column {} is not contiguous".format(col))
+            runs.append((col, rows[0], rows[-1]))
+        runs = np.array(runs).reshape(-1, 3)
+
+        # offsets at which the two sprites' boxes overlap at all
+        self.min_ox = -(pipe_w - 1)
+        self.min_oy = -(pipe_h - 1)
+        width = pipe_w + bird_w - 1
+        depth = pipe_h + bird_h - 1
+
+        self.hits = np.zeros((len(birds), width, depth), dtype=bool)
+        for frame, bird in enumerate(birds):
+            by, bx = np.nonzero(bird) # every opaque bird pixel
+            # a bird pixel (bx, by) touches pipe pixel (px, py) when ox = bx - px and oy = by - py
+            ox = (bx[:, None] - runs[None, :, 0]).ravel() - self.min_ox
+            first = (by[:, None] - runs[None, :, 2]).ravel() - self.min_oy
+            last = (by[:, None] - runs[None, :, 1]).ravel() - self.min_oy
+
+            # mark every [first, last] range of oy with a difference array, then add it up
+            size = width * (depth + 1)
+            diff = np.bincount(ox*(depth + 1) + first, minlength=size) - np.bincount(ox*(depth + 1) + last + 1, minlength=size)
+            self.hits[frame] = np.cumsum(diff.reshape(width, depth + 1), axis=1)[:, :depth] > 0
+
+    def collide(self, frames, ox, oy, geometric=False):
+        """
+        checks many birds against one pipe
+        :param frames: int array, image index of each bird
+        :param ox: int, pipe.x - bird.x (the same for every bird)
+        :param oy: int array, pipe top (or bottom) minus round(bird.y) for each bird
+        :param geometric: count touching rectangles as a hit instead of testing pixels
+        :return: bool array, True where the bird touches the pipe
+        """
+        result = np.zeros(len(frames), dtype=bool)
+        ix = ox - self.min_ox
+        if ix < 0 or ix >= self.hits.shape[1]: # too far left or right to touch
+            return result
+
+        iy = oy - self.min_oy
+        inside = (iy >= 0) & (iy < self.hits.shape[2]) # the table covers exactly the offsets where the rectangles touch
+        if geometric:
+            return inside
+        result[inside] = self.hits[frames[inside], ix, iy[inside]]
+        return result
+
+
+class BirdPopulation:
+    """
+    Every bird of a generation stored as arrays (struct of arrays).
+
+    Birds are never removed, a dead bird just has alive set to False, so index i
+    always refers to the i-th genome of the generation. Physics and animation
+    follow Bird.move and Bird.animate exactly.
+    """
+
+    ANIMATION_TIME = 5 #same as Bird.ANIMATION_TIME
+
+    def __init__(self, size, x, y, img_heights):
+        """
+        Initializing the population
+        :param size: number of birds (int)
+        :param x: starting x pos, shared by every bird (int)
+        :param y: starting y pos (int)
+        :param img_heights: height of each bird image (list of int)
+        :return: None
+        """
+        self.x = x #birds never move horizontally, so one x for all
+        self.y = np.full(size, y, dtype=np.float64) #y pos of each bird
+        self.tilt = np.zeros(size, dtype=np.int64) #tilt of each bird
+        self.tick_count = np.zeros(size, dtype=np.int64) #frames since last jump
+        self.vel = np.zeros(size, dtype=np.float64) #velocity at last jump
+        self.height = self.y.copy() #y pos at last jump
+        self.img_count = np.zeros(size, dtype=np.int64) #animation counter
+        self.frame = np.zeros(size, dtype=np.int64) #index of the image currently shown
+        self.alive = np.ones(size, dtype=bool) #birds still playing
+        self.fitness = np.zeros(size, dtype=np.float64) #fitness gathered so far
+        self.img_heights = np.asarray(img_heights)
+
+    def __len__(self):
+        """
+        number of birds still alive
+        :return: int
+        """
+        return int(np.count_nonzero(self.alive))
+
+    def alive_index(self):
+        """
+        indices of the birds still alive
+        :return: int array
+        """
+        return np.flatnonzero(self.alive)
+
+    def leaders(self, k):
+        """
+        indices of the k fittest birds still alive. Alive birds have often
+        gathered the same fitness, ties go to the lower index so the same birds
+        keep being picked from one frame to the next.
+        :param k: number of birds (int)
+        :return: int array, fittest first
+        """
+        alive = self.alive_index()
+        order = np.argsort(-self.fitness[alive], kind="stable")
+        return alive[order[:k]]
+
+    def y_histogram(self, bin_size, height):
+        """
+        number of alive birds in each horizontal band of the screen
+        :param bin_size: height of a band in pixels (int)
+        :param height: height of the screen (int), birds above or below are counted in the first or last band
+        :return: int array, one count per band from the top
+        """
+        bands = -(-height // bin_size)
+        index = np.clip(self.y[self.alive] // bin_size, 0, bands - 1).astype(np.int64)
+        return np.bincount(index, minlength=bands)
+
+    def jump(self, index):
+        """
+        making the given birds jump, like Bird.jump
+        :param index: int array (or bool mask) of birds to jump
+        :return: None
+        """
+        self.vel[index] = -10.5
+        self.tick_count[index] = 0
+        self.height[index] = self.y[index]
+
+    def move(self):
+        """
+        moving every alive bird one frame, like Bird.move, with the physics tables
+        :return: None
+        """
+        alive = self.alive
+        self.tick_count[alive] += 1
+        row = (self.vel != 0).astype(np.int64) # physics.FALLING or physics.JUMPED
+        t = np.minimum(self.tick_count, LENGTH - 1) # past the tables every tick is the same
+
+        self.y = np.where(alive, self.y + DISPLACEMENT_TABLE[row, t], self.y)
+        self.tilt = np.where(alive, TILT_TABLE[row, t], self.tilt)
+
+    def animate(self):
+        """
+        advancing the wing flapping of every alive bird one frame, like Bird.animate
+        :return: None
+        """
+        alive = self.alive
+        count = self.img_count + alive
+        a = self.ANIMATION_TIME
+
+        frame = np.select([count <= a, count <= a*2, count <= a*3, count <= a*4, count == a*4 + 1],
+                          [0, 1, 2, 1, 0], self.frame)
+        count = np.where(count == a*4 + 1, 0, count)
+
+        # no flapping while nose diving
+        diving = self.tilt <= -80
+        frame = np.where(diving, 0, frame)
+        count = np.where(diving, a*2, count)
+
+        self.frame = np.where(alive, frame, self.frame)
+        self.img_count = np.where(alive, count, self.img_count)
+
+    def hit_pipes(self, pipes, top_table, bottom_table, geometric=False):
+        """
+        alive birds colliding with any pipe, like Pipe.collide
+        :param pipes: PipeRing
+        :param top_table: PipeCollisionTable for the top pipe image
+        :param bottom_table: PipeCollisionTable for the bottom pipe image
+        :param geometric: count touching rectangles as a hit instead of testing pixels
+        :return: bool array, True for birds that hit a pipe
+        """
+        ry = np.round(self.y).astype(np.int64) # same rounding as round(bird.y)
+        hit = np.zeros(len(self.y), dtype=bool)
+        for slot in pipes:
+            ox = int(pipes.x[slot]) - self.x
+            hit |= top_table.collide(self.frame, ox, pipes.top[slot] - ry, geometric)
+            hit |= bottom_table.collide(self.frame, ox, pipes.bottom[slot] - ry, geometric)
+        return hit & self.alive
+
+    def out_of_bounds(self, floor):
+        """
+        alive birds that hit the floor or flew above the screen
+        :param floor: y pos of the floor (int)
+        :return: bool array
+        """
+        out = (self.y + self.img_heights[self.frame] - 10 >= floor) | (self.y < -50)
+        return out & self.alive
+
+    def kill(self, dead):
+        """
+        removing birds from the game
+        :param dead: bool array of birds to remove
+        :return: None
+        """
+        self.alive &= ~dead
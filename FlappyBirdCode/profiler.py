@@ -0,0 +1,194 @@
+"""
+Per-phase timing of the game loops.
+
+A frame goes through the same phases in both games: events, physics, network
+inference, collision, pipe spawn/cull, rendering and the display flip. The
+loops mark the end of each phase with profiler.lap(name), which books the time
+since the previous mark to that phase, and close the frame with
+profiler.end_frame(), which adds the frame's time in every phase to that
+phase's histogram. Counters (mask builds, network activations, blits) are
+bumped with profiler.count(name, n).
+
+The profiler is off unless FLAPPY_PROFILE=1 is set (--profile sets it for the
+NEAT trainer), and then every call returns straight away, so the marks can
+stay in the loops.
+"""
+import os #FLAPPY_PROFILE switch
+import time #timing
+
+
+PHASES = ("event", "physics", "inference", "collision", "spawn/cull", "render", "flip") # in frame order
+BUCKETS = 24 # histogram buckets, bucket b counts times under 2**b microseconds (the last one takes the rest)
+
+
+class PhaseStats:
+    """
+    Histogram of the time one phase took per frame
+    """
+
+    def __init__(self):
+        self.frames = 0 # frames that went through the phase
+        self.total = 0 # nanoseconds over every frame
+        self.max = 0 # slowest frame, nanoseconds
+        self.buckets = [0] * BUCKETS # log2 histogram of microseconds
+
+    def add(self, ns):
+        """
+        records the time of one frame
+        :param ns: nanoseconds (int)
+        :return: None
+        """
+        self.frames += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        self.buckets[min((ns // 1000).bit_length(), BUCKETS - 1)] += 1
+
+    def merge(self, other):
+        """
+        adds the frames of another histogram, e.g. from a worker process
+        :param other: PhaseStats
+        :return: None
+        """
+        self.frames += other.frames
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile(self, fraction):
+        """
+        upper bound of a percentile, to the histogram's resolution
+        :param fraction: 0.5 for the median, 0.95 for the 95th percentile...
+        :return: microseconds (int)
+        """
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= fraction * self.frames:
+                return 2 ** bucket
+        return 2 ** (BUCKETS - 1)
+
+
+class FrameProfiler:
+    """
+    Phase timings and counters of the game loop
+    """
+
+    def __init__(self, enabled=False):
+        """
+        :param enabled: record anything at all (bool)
+        :return: None
+        """
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """
+        forgets everything recorded so far
+        :return: None
+        """
+        self.phases = {} # name -> PhaseStats
+        self.counters = {} # name -> int
+        self.frames = 0 # frames ended
+        self.pending = {} # name -> nanoseconds spent in the phase this frame
+        self.mark = time.perf_counter_ns()
+
+    def begin(self):
+        """
+        starts timing a frame, leaving out whatever happened since the last mark (frame limiting)
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self.mark = time.perf_counter_ns()
+
+    def lap(self, phase):
+        """
+        books the time since the previous mark to a phase
+        :param phase: name, one of PHASES
+        :return: None
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        self.pending[phase] = self.pending.get(phase, 0) + now - self.mark
+        self.mark = now
+
+    def count(self, name, n=1):
+        """
+        bumps a counter
+        :param name: str
+        :param n: amount (int)
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def end_frame(self):
+        """
+        adds the frame's phase times to the histograms
+        :return: None
+        """
+        if not self.enabled:
+            return
+        for phase, ns in self.pending.items():
+            stats = self.phases.get(phase)
+            if stats is None:
+                stats = self.phases[phase] = PhaseStats()
+            stats.add(ns)
+        self.pending.clear()
+        self.frames += 1
+
+    def take(self):
+        """
+        hands over what was recorded and starts over, to send it from a worker process
+        :return: (frames, phases, counters)
+        """
+        recorded = (self.frames, self.phases, self.counters)
+        self.reset()
+        return recorded
+
+    def merge(self, recorded):
+        """
+        adds what another profiler recorded
+        :param recorded: from take()
+        :return: None
+        """
+        frames, phases, counters = recorded
+        self.frames += frames
+        for phase, stats in phases.items():
+            self.phases.setdefault(phase, PhaseStats()).merge(stats)
+        for name, n in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self, title="Profile"):
+        """
+        a table of the phases, slowest total first, and the counters
+        :param title: first line
+        :return: str
+        """
+        total = sum(stats.total for stats in self.phases.values())
+        lines = ["{}: {} frames, {:.1f} ms".format(title, self.frames, total / 1e6),
+                 "  {:<11}{:>10}{:>7}{:>10}{:>9}{:>9}{:>9}".format("phase", "total ms", "share", "mean us", "p50 us", "p95 us", "max us")]
+        for phase, stats in sorted(self.phases.items(), key=lambda item: -item[1].total):
+            lines.append("  {:<11}{:>10.1f}{:>7.1%}{:>10.1f}{:>9}{:>9}{:>9.0f}".format(
+                phase, stats.total / 1e6, stats.total / max(total, 1), stats.total / 1e3 / stats.frames,
+                "<" + str(stats.percentile(0.5)), "<" + str(stats.percentile(0.95)), stats.max / 1e3))
+        if self.counters:
+            lines.append("  " + ", ".join("{}: {}".format(name, n) for name, n in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+    def report(self, title="Profile"):
+        """
+        prints the summary and starts over
+        :param title: first line
+        :return: None
+        """
+        if not self.enabled:
+            return
+        print(self.summary(title))
+        self.reset()
+
+
+profiler = FrameProfiler(os.environ.get("FLAPPY_PROFILE") == "1") # shared by every loop of the process
@@ -0,0 +1,80 @@
+"""
+Dirty rectangle rendering.
+
+Redrawing the whole background and pushing the whole window every frame costs
+the same however little moved. A DirtyRectRenderer remembers where things were
+drawn last frame: the next frame only puts the background back over those
+areas, the sprites are drawn again, and only the old and new areas of the
+sprites are pushed to the display.
+"""
+import pygame #display updates
+
+
+class DirtyRectRenderer:
+    """
+    Draws frames over a static background, updating only what changed
+    """
+
+    def __init__(self, background):
+        """
+        :param background: pygame Surface covering the whole window, best converted to the display format
+        :return: None
+        """
+        self.background = background
+        self.drawn = [] # areas drawn over the background last frame
+        self.dirty = [] # areas to push to the display this frame
+        self.full = True # next frame redraws and pushes the whole window
+
+    def reset(self):
+        """
+        makes the next frame redraw the whole window, e.g. after something else drew on it
+        :return: None
+        """
+        self.full = True
+
+    def begin(self, win):
+        """
+        starts a frame: puts the background back where sprites were drawn last frame
+        :param win: pygame window surface
+        :return: None
+        """
+        if self.full:
+            win.blit(self.background, (0, 0))
+        else:
+            for rect in self.drawn:
+                win.blit(self.background, rect, rect) # same area of the background
+        self.dirty = self.drawn
+        self.drawn = []
+
+    def add(self, *rects):
+        """
+        records areas drawn this frame
+        :param rects: pygame Rect returned by blit
+        :return: None
+        """
+        self.drawn.extend(rects)
+
+    def blit(self, win, image, pos):
+        """
+        draws a sprite and records its area
+        :param win: pygame window surface
+        :param image: pygame Surface
+        :param pos: top left position
+        :return: pygame Rect
+        """
+        rect = win.blit(image, pos)
+        self.drawn.append(rect)
+        return rect
+
+    def end(self):
+        """
+        ends a frame: pushes last frame's and this frame's sprite areas to the display
+        :return: number of areas pushed, 0 for the whole window
+        """
+        if self.full:
+            pygame.display.update()
+            self.full = False
+            return 0
+        dirty = self.dirty + self.drawn
+        pygame.display.update(dirty)
+        return len(dirty)
@@ -0,0 +1,92 @@
+"""
+Pre-rotated bird sprites.
+
+blitRotateCenter used to rotate the bird image on every draw. A bird only ever
+shows one of its three images at one of a handful of tilts (physics.TILT, plus
+0 before its first move), so every (image, tilt) pair is rotated once at load
+time and drawing a bird is a lookup and a blit. A tilt that is not in the atlas
+is rotated the first time it is drawn and kept.
+
+Collision uses the unrotated images, so the atlas keeps no masks; those come
+from collision.get_mask only.
+"""
+import pygame #rotating and converting surfaces
+from physics import TILT #every tilt a bird can have
+
+
+TILTS = sorted(set(TILT[0]) | set(TILT[1]) | {0}) # tilts of the atlas, 0 is the starting tilt
+
+
+class RotatedSprite:
+    """
+    One image rotated by one angle
+    """
+
+    def __init__(self, image, angle):
+        """
+        rotating the image
+        :param image: pygame Surface
+        :param angle: degrees
+        :return: None
+        """
+        self.image = pygame.transform.rotate(image, angle)
+        if pygame.display.get_surface() is not None:
+            self.image = self.image.convert_alpha() # display format blits faster, headless has no display to convert to
+        width, height = image.get_size()
+        rotated_width, rotated_height = self.image.get_size()
+        # rotating around the center moves the top left corner by this much
+        self.offset = (width//2 - rotated_width//2, height//2 - rotated_height//2)
+
+    def rect(self, topleft):
+        """
+        where the sprite lands for an unrotated image at topleft, same as blitRotateCenter
+        :param topleft: top left of the unrotated image
+        :return: pygame Rect
+        """
+        x, y = self.image.get_rect(topleft=topleft).topleft # rounded the way pygame rounds a float position
+        return self.image.get_rect(topleft=(x + self.offset[0], y + self.offset[1]))
+
+
+class SpriteAtlas:
+    """
+    Rotated sprites of some images at some angles
+    """
+
+    def __init__(self, images, angles=TILTS):
+        """
+        rotating every image by every angle
+        :param images: list of pygame Surface
+        :param angles: list of degrees
+        :return: None
+        """
+        self.sprites = {} # (image, angle) -> RotatedSprite
+        for image in images:
+            for angle in angles:
+                self.get(image, angle)
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def get(self, image, angle):
+        """
+        the rotated sprite of an image
+        :param image: pygame Surface
+        :param angle: degrees
+        :return: RotatedSprite
+        """
+        sprite = self.sprites.get((image, angle))
+        if sprite is None: # an angle the atlas was not built with
+            sprite = self.sprites[(image, angle)] = RotatedSprite(image, angle)
+        return sprite
+
+    def blit(self, surf, image, topleft, angle):
+        """
+        draws an image rotated around its center, like blitRotateCenter
+        :param surf: the surface to blit to
+        :param image: the unrotated image
+        :param topleft: top left position of the unrotated image
+        :param angle: degrees
+        :return: pygame Rect of the area drawn
+        """
+        sprite = self.get(image, angle)
+        return surf.blit(sprite.image, sprite.rect(topleft))
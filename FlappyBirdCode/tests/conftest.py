@@ -0,0 +1,7 @@
+"""
+The game modules import each other by name from FlappyBirdCode, so the tests do too.
+"""
+import os #path of the game modules
+import sys #import path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
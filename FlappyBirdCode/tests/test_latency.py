@@ -0,0 +1,25 @@
+"""
+Percentiles of the latency summary.
+"""
+import pytest #parametrized tests
+
+from latency import percentile #nearest rank percentile
+
+
+@pytest.mark.parametrize("n", [1, 2, 4, 5, 9, 13, 30, 100])
+@pytest.mark.parametrize("fraction", [0.5, 0.95, 0.99])
+def test_percentile_is_nearest_rank(n, fraction):
+    values = list(range(1, n + 1)) # the k-th smallest value is k
+    rank = percentile(values, fraction)
+    # nearest rank: the smallest value with at least that fraction of the values at or below it
+    assert rank / n >= fraction
+    assert rank == 1 or (rank - 1) / n < fraction
+
+
+def test_percentile_medians_and_tail():
+    assert percentile([1, 2, 3, 4, 5], 0.5) == 3
+    assert percentile(list(range(1, 10)), 0.5) == 5
+    assert percentile(list(range(1, 14)), 0.5) == 7
+    assert percentile(list(range(1, 31)), 0.95) == 29
+    assert percentile([7], 0.99) == 7
+    assert percentile([], 0.5) is None
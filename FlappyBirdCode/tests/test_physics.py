@@ -0,0 +1,113 @@
+"""
+The physics tables against the per-frame formula Bird.move used before them.
+"""
+import numpy as np #the vectorized population
+import pytest #parametrized tests
+
+import physics #precomputed bird physics
+from population import BirdPopulation #vectorized birds moved with the tables
+
+
+TICKS = 3 * physics.LENGTH # well past the tables, into the clamped tail
+
+
+class ReferenceBird:
+    """
+    A bird moved the way Bird.move did it every frame, before the tables
+    """
+
+    MAX_ROTATION = 25
+    ROT_VEL = 20
+
+    def __init__(self, y):
+        self.y = y
+        self.tilt = 0
+        self.tick_count = 0
+        self.vel = 0
+        self.height = y
+
+    def jump(self):
+        self.vel = -10.5
+        self.tick_count = 0
+        self.height = self.y
+
+    def move(self):
+        """
+        one frame of the original Bird.move
+        :return: displacement of the frame
+        """
+        self.tick_count += 1
+        displacement = self.vel*(self.tick_count) + 0.5*(3)*(self.tick_count)**2
+        if displacement >= 16:
+            displacement = (displacement/abs(displacement)) * 16
+        if displacement < 0:
+            displacement -= 2
+        self.y = self.y + displacement
+        if displacement < 0 or self.y < self.height + 50:
+            if self.tilt < self.MAX_ROTATION:
+                self.tilt = self.MAX_ROTATION
+        else:
+            if self.tilt > -90:
+                self.tilt -= self.ROT_VEL
+        return displacement
+
+
+def reference_path(jump, ticks=TICKS):
+    """
+    displacement and tilt of every tick of a reference bird
+    :param jump: jump before the first tick, or only fall
+    :param ticks: number of ticks
+    :return: list of (displacement, tilt), tick 1 first
+    """
+    bird = ReferenceBird(350)
+    if jump:
+        bird.jump()
+    return [(bird.move(), bird.tilt) for _ in range(ticks)]
+
+
+def test_tables_cover_the_fall_to_terminal_velocity():
+    for row in (physics.FALLING, physics.JUMPED):
+        assert len(physics.DISPLACEMENT[row]) == physics.LENGTH == 32
+        assert physics.DISPLACEMENT[row][-1] == physics.TERMINAL
+        assert physics.TILT[row][-1] == physics.TILT[row][-2] # fully nose down
+
+
+@pytest.mark.parametrize("vel", [0, physics.JUMP_VEL])
+def test_lookup_matches_bird_move(vel):
+    # ticks 1..31 are read from the tables, later ones from the clamped last entry
+    for tick, (displacement, tilt) in enumerate(reference_path(vel != 0), 1):
+        assert physics.lookup(vel, tick) == (displacement, tilt), tick
+
+
+@pytest.mark.parametrize("vel", [0, physics.JUMP_VEL])
+@pytest.mark.parametrize("tick", [0, 1, 7, physics.LENGTH - 2, physics.LENGTH - 1, physics.LENGTH + 5])
+def test_advance_matches_moving_tick_by_tick(vel, tick):
+    path = reference_path(vel != 0, tick + TICKS)
+    y = 350 + sum(d for d, _ in path[:tick])
+    for ticks in range(TICKS):
+        expected = y + sum(d for d, _ in path[tick:tick + ticks])
+        assert physics.advance(y, vel, tick, ticks) == expected, (tick, ticks)
+
+
+def test_population_move_matches_bird_move():
+    rng = np.random.default_rng(0)
+    size = 40
+    birds = BirdPopulation(size, 230, 350, [24, 24, 24])
+    reference = [ReferenceBird(350) for _ in range(size)]
+
+    for frame in range(4 * TICKS):
+        # some birds jump often, some rarely, so every tick count up to the tail comes up
+        jumping = np.flatnonzero(rng.random(size) < np.linspace(0.0, 0.2, size))
+        birds.jump(jumping)
+        for i in jumping:
+            reference[i].jump()
+        if frame == 2 * TICKS:
+            birds.alive[:5] = False # dead birds stay where they are
+
+        birds.move()
+        for i, bird in enumerate(reference):
+            if birds.alive[i]:
+                bird.move()
+        assert birds.y.tolist() == [bird.y for bird in reference]
+        assert birds.tilt.tolist() == [bird.tilt for bird in reference]
+    assert birds.tick_count.max() > physics.LENGTH